@@ -13,6 +13,8 @@ class CommunicationsConfig(AppConfig):
     name = 'communications'
 
     def ready(self) -> None:
+        from . import signals  # noqa: F401
+
         try:
             connect(
                 host=EnvConfig.mongo_host(),
@@ -0,0 +1,48 @@
+from bson.objectid import ObjectId
+from django.conf import settings
+
+from forum.cache import TTLCache
+
+from .mongo_models import Room
+
+REQUEST_ROOMS_ATTR = "_rooms_cache"
+
+# Cached rooms are shared between requests and threads, use them only to read
+# data which never changes after room creation (e.g. participants).
+room_cache = TTLCache(
+    maxsize=settings.ROOM_CACHE_SIZE,
+    ttl=settings.ROOM_CACHE_TTL
+)
+
+
+def get_room(room_id: ObjectId | str, request=None) -> Room | None:
+    """
+        Return the room by id, looking it up in the request scoped cache first,
+        then in the process level cache and only then in the database.
+
+    Raises:
+        InvalidId: if room_id is not a valid ObjectId
+    """
+    room_id = ObjectId(room_id)
+
+    request_rooms = None
+    if request is not None:
+        http_request = getattr(request, "_request", request)
+        request_rooms = getattr(http_request, REQUEST_ROOMS_ATTR, None)
+        if request_rooms is None:
+            request_rooms = {}
+            setattr(http_request, REQUEST_ROOMS_ATTR, request_rooms)
+
+        if room_id in request_rooms:
+            return request_rooms[room_id]
+
+    room = room_cache.get(room_id)
+    if room is None:
+        room = Room.objects(id=room_id).first()
+        if room is not None:
+            room_cache.set(room_id, room)
+
+    if request_rooms is not None:
+        request_rooms[room_id] = room
+
+    return room
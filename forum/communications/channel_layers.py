@@ -0,0 +1,42 @@
+import logging
+
+from channels.exceptions import ChannelFull
+from channels_redis.core import RedisChannelLayer
+
+from forum.logging import logger
+from forum.metrics import get_counters
+
+channel_layer_metrics = get_counters("channel_layer")
+
+# message channels_redis logs when group_send drops messages of full channels
+GROUP_OVERFLOW_MESSAGE = "%s of %s channels over capacity in group %s"
+
+
+class MonitoredRedisChannelLayer(RedisChannelLayer):
+    """
+        RedisChannelLayer counting messages dropped because channels are full.
+        Channels and groups are spread over all `hosts` with consistent hashing.
+    """
+
+    async def send(self, channel: str, message: dict) -> None:
+        try:
+            await super().send(channel, message)
+        except ChannelFull:
+            channel_layer_metrics.increment("channel_full")
+            logger.warning(f"Channel {channel} is full, message '{message.get('type')}' was dropped")
+            raise
+
+
+class GroupOverflowFilter(logging.Filter):
+    """
+        Count group_send overflows reported by channels_redis, which only logs them.
+        Attached to the `channels_redis.core` logger in LOGGING.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.msg == GROUP_OVERFLOW_MESSAGE and record.args:
+            over_capacity = record.args[0]
+            channel_layer_metrics.increment("group_overflow")
+            channel_layer_metrics.increment("group_overflow_channels", over_capacity)
+
+        return True
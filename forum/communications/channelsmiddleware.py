@@ -6,20 +6,24 @@ from rest_framework_simplejwt.exceptions import (
     TokenError,
 )
 from rest_framework_simplejwt.tokens import AccessToken
+from users.authentication import get_cached_user, get_user as load_user
 from users.models import CustomUser
 
 AUTH_HEADER_KEY = b'authorization'
 
 
-@database_sync_to_async
-def get_user(user_id: int) -> CustomUser:
-    try:
-        return CustomUser.objects.get(user_id=user_id)
-    except CustomUser.DoesNotExist:
+async def get_user(user_id: int) -> CustomUser:
+    """
+        Return the user from the user cache, the database is queried only on a cache miss.
+    """
+    user = get_cached_user(user_id)
+    if user is None:
+        user = await database_sync_to_async(load_user)(user_id)
+
+    if user is None:
         raise AuthenticationFailed()
-    except Exception:
-        # TODO: call logging function
-        ...
+
+    return user
 
 
 class JwtAuthMiddleware(BaseMiddleware):
@@ -0,0 +1,159 @@
+import threading
+from abc import ABC, abstractmethod
+from functools import cache
+
+import redis
+from bson.objectid import ObjectId
+from django.conf import settings
+
+from forum.cache import TTLCache
+
+from .mongo_models import NamespaceInfo, NotificationInbox, NotificationTypeEnum
+
+KEY_PREFIX = "notification_coalesce"
+
+
+class BaseCoalescingBackend(ABC):
+    @abstractmethod
+    def claim_many(self, keys: list[str], notification_id: ObjectId) -> dict[str, ObjectId]:
+        """
+            Store `notification_id` under every key which is not stored yet.
+
+        Returns:
+            dict[str, ObjectId]: keys which are already stored with their notification id
+        """
+
+    @abstractmethod
+    def set_many(self, keys: list[str], notification_id: ObjectId) -> None:
+        ...
+
+
+class LocalCoalescingBackend(BaseCoalescingBackend):
+    """
+        Process level backend, bursts are coalesced only within one worker.
+    """
+
+    def __init__(self, window: int, maxsize: int = 65536) -> None:
+        self.cache = TTLCache(maxsize=maxsize, ttl=window)
+        self._lock = threading.Lock()
+
+    def claim_many(self, keys: list[str], notification_id: ObjectId) -> dict[str, ObjectId]:
+        claimed = {}
+
+        with self._lock:
+            for key in keys:
+                existing = self.cache.get(key)
+                if existing is None:
+                    self.cache.set(key, notification_id)
+                else:
+                    claimed[key] = existing
+
+        return claimed
+
+    def set_many(self, keys: list[str], notification_id: ObjectId) -> None:
+        for key in keys:
+            self.cache.set(key, notification_id)
+
+
+class RedisCoalescingBackend(BaseCoalescingBackend):
+    def __init__(self, url: str, window: int) -> None:
+        self.client = redis.Redis.from_url(url)
+        self.window = window
+
+    def claim_many(self, keys: list[str], notification_id: ObjectId) -> dict[str, ObjectId]:
+        pipeline = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipeline.set(key, str(notification_id), nx=True, ex=self.window)
+            pipeline.get(key)
+        results = pipeline.execute()
+
+        return {
+            key: ObjectId(stored.decode())
+            for key, is_set, stored in zip(keys, results[::2], results[1::2])
+            if not is_set and stored is not None
+        }
+
+    def set_many(self, keys: list[str], notification_id: ObjectId) -> None:
+        pipeline = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipeline.set(key, str(notification_id), ex=self.window)
+        pipeline.execute()
+
+
+@cache
+def get_coalescing_backend() -> BaseCoalescingBackend:
+    if settings.NOTIFICATION_COALESCE_REDIS_URL:
+        return RedisCoalescingBackend(
+            settings.NOTIFICATION_COALESCE_REDIS_URL,
+            settings.NOTIFICATION_COALESCE_WINDOW
+        )
+
+    return LocalCoalescingBackend(settings.NOTIFICATION_COALESCE_WINDOW)
+
+
+class NotificationCoalescer:
+    """
+        Merge notifications with the same initiator, receiver and type sent within
+        NOTIFICATION_COALESCE_WINDOW seconds into the first one, increasing
+        the `count` of the receiver's inbox row instead of creating a new notification.
+    """
+
+    def __init__(
+        self,
+        initiator: NamespaceInfo,
+        notification_type: NotificationTypeEnum,
+        backend: BaseCoalescingBackend | None = None
+    ) -> None:
+        self.initiator = initiator
+        self.notification_type = notification_type
+        self.backend = backend or get_coalescing_backend()
+
+    def _key(self, receiver: NamespaceInfo) -> str:
+        return (
+            f"{KEY_PREFIX}:{self.initiator.namespace.value}_{self.initiator.namespace_id}:"
+            f"{receiver.user_id}:{self.notification_type.value}"
+        )
+
+    def coalesce(
+        self,
+        notification_id: ObjectId,
+        receivers: list[NamespaceInfo]
+    ) -> list[NamespaceInfo]:
+        """
+            Reserve `notification_id` for the receivers and merge the event
+            into pending notifications of receivers which already have one.
+
+        Returns:
+            list[NamespaceInfo]: receivers which should get the new notification
+        """
+        keys = {self._key(receiver): receiver for receiver in receivers}
+        claimed = self.backend.claim_many(list(keys), notification_id)
+        if not claimed:
+            return receivers
+
+        pending: dict[ObjectId, list[int]] = {}
+        for key, pending_id in claimed.items():
+            pending.setdefault(pending_id, []).append(keys[key].user_id)
+
+        merged: set[int] = set()
+        inbox = NotificationInbox._get_collection()
+        for pending_id, user_ids in pending.items():
+            # rows of receivers who already acknowledged the notification are gone
+            existing = [
+                row["user_id"] for row in inbox.find(
+                    {"notification": pending_id, "user_id": {"$in": user_ids}},
+                    {"_id": False, "user_id": True}
+                )
+            ]
+            if existing:
+                inbox.update_many(
+                    {"notification": pending_id, "user_id": {"$in": existing}},
+                    {"$inc": {"count": 1}}
+                )
+                merged.update(existing)
+
+        fresh_keys = [key for key in claimed if keys[key].user_id not in merged]
+        if fresh_keys:
+            self.backend.set_many(fresh_keys, notification_id)
+
+        return [receiver for receiver in receivers if receiver.user_id not in merged]
@@ -1,22 +1,34 @@
+import asyncio
 from abc import ABC, abstractmethod
 from typing import Any
+from urllib.parse import parse_qs
 
 from bson.errors import InvalidId
 from bson.objectid import ObjectId
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
 from rest_framework_simplejwt.exceptions import (
     AuthenticationFailed,
     InvalidToken,
     TokenError,
 )
 from rest_framework_simplejwt.tokens import AccessToken
+from notifications.services import NotificationService
 from users.models import CustomUser
 
+from forum import encoders
 from forum.logging import logger
 
+from .cache import get_room
 from .channelsmiddleware import get_user
-from .mongo_models import Notification
-from .utils import AutoSerializer, ClientErrorBuilder
+from .exceptions import BaseNotificationException
+from .executors import mongo_sync_to_async
+from .helpers import get_room_group_name
+from .limiters import OutboundQueue, TokenBucket, websocket_limiter_metrics
+from .mongo_models import Message, Room
+from .serializers import ChatMessageSerializer
+from .services import ChatService
+from .utils import AutoSerializer, ClientErrorBuilder, NotificationBuilder
 
 
 class BaseCommunicationConsumer(ABC, AsyncJsonWebsocketConsumer):
@@ -28,6 +40,14 @@ class BaseCommunicationConsumer(ABC, AsyncJsonWebsocketConsumer):
     async def receive_json(self, content: dict, **kwargs):
         ...
 
+    @classmethod
+    async def encode_json(cls, content: Any) -> str:
+        return encoders.dumps_str(content)
+
+    @classmethod
+    async def decode_json(cls, text_data: str) -> Any:
+        return encoders.loads(text_data)
+
     async def send_json(self, content: Any, close: bool = False):
         try:
             await super().send_json(content, close)
@@ -72,6 +92,18 @@ class NotificationConsumer(BaseCommunicationConsumer):
 
         self.user_id = user.user_id
         self.room_group_name = f"notifications_{user.user_id}"
+        # chat room groups joined on demand, see `_update_room_subscription`
+        self.chat_room_groups: set[str] = set()
+
+        self.frame_limiter = TokenBucket(settings.WS_FRAME_RATE, settings.WS_FRAME_BURST)
+        self.rate_limit_strikes = 0
+        self.outbound = OutboundQueue(
+            settings.WS_OUTBOUND_QUEUE_SIZE,
+            {
+                "type": "notifications_overflow",
+                "message": "Too many notifications, fetch them via REST"
+            }
+        )
 
         await self.channel_layer.group_add(
             self.room_group_name,
@@ -80,24 +112,186 @@ class NotificationConsumer(BaseCommunicationConsumer):
 
         await self.accept()
 
+        self.writer = asyncio.create_task(self._write_outbound())
+
+        since = self._get_since()
+        if since:
+            await self._backfill(since)
+
+    def _get_since(self) -> ObjectId | None:
+        """
+            Return `since` query param, id of the last notification the client received.
+        """
+        query = parse_qs(self.scope.get("query_string", b"").decode())
+        since = query.get("since")
+        if not since:
+            return None
+
+        try:
+            return ObjectId(since[0])
+        except InvalidId:
+            logger.warning(f"Invalid 'since' cursor was provided by user {self.user_id}")
+            return None
+
+    async def _backfill(self, since: ObjectId) -> None:
+        """
+            Send notifications missed while the socket was down in bounded batches.
+            The socket has already joined the group, so a notification pushed meanwhile
+            may be received twice, clients deduplicate them by id.
+        """
+        batch_size = settings.NOTIFICATION_BACKFILL_BATCH_SIZE
+        remaining = settings.NOTIFICATION_BACKFILL_LIMIT
+        since_created_at = None
+
+        while remaining > 0:
+            limit = min(batch_size, remaining)
+            batch, next_cursor = await mongo_sync_to_async(NotificationService.get_since)(
+                self.user_id,
+                since=since,
+                limit=limit,
+                since_created_at=since_created_at
+            )
+
+            for document in batch:
+                builder = NotificationBuilder()
+                builder.build_from_document(document)
+                await self._verify_and_send(builder.ws_message, wait=True)
+
+            if next_cursor is None:
+                break
+
+            since_created_at, since = next_cursor
+            remaining -= limit
+
     async def disconnect(self, code: int):
         await self.channel_layer.group_discard(
             self.room_group_name, self.channel_name
         )
 
-    async def _verify_and_send(self, event: dict):
+        for group_name in getattr(self, "chat_room_groups", ()):
+            await self.channel_layer.group_discard(group_name, self.channel_name)
+
+        writer = getattr(self, "writer", None)
+        if writer:
+            writer.cancel()
+
+    async def _update_room_subscription(self, validated_data: dict) -> None:
+        """
+            Join or leave the group of a chat room the user participates in,
+            so chat events of the room are delivered with a single group send.
+        """
+        client_error_builder = ClientErrorBuilder()
+
+        try:
+            room: Room | None = await mongo_sync_to_async(get_room)(validated_data["room"])
+        except InvalidId:
+            room = None
+
+        if room is None or not any(
+            participant.user_id == self.user_id for participant in room.participants
+        ):
+            client_error_builder.build("Room does not exist or you are not its participant")
+            await client_error_builder.send(self.room_group_name)
+            return
+
+        group_name = get_room_group_name(room.pk)
+
+        if validated_data["type"] == "room_leave":
+            self.chat_room_groups.discard(group_name)
+            await self.channel_layer.group_discard(group_name, self.channel_name)
+            return
+
+        if group_name in self.chat_room_groups:
+            return
+
+        if len(self.chat_room_groups) >= settings.CHAT_ROOMS_PER_SOCKET:
+            client_error_builder.build("Too many chat rooms joined")
+            await client_error_builder.send(self.room_group_name)
+            return
+
+        self.chat_room_groups.add(group_name)
+        await self.channel_layer.group_add(group_name, self.channel_name)
+
+    async def _write_outbound(self) -> None:
+        """
+            Write queued frames to the socket one by one, so a slow client
+            only fills its own queue instead of delaying channel layer events.
+        """
+        while True:
+            frame = await self.outbound.get()
+            await self.send_json(frame)
+
+    async def _verify_and_send(self, event: dict, wait: bool = False):
+        """
+            Validate the event and queue it for the writer.
+            Events of the channel layer never wait, they are dropped when the queue is full,
+            `wait` is used for frames produced by the socket itself, e.g. the backfill.
+        """
         auto_serializer = AutoSerializer(event, self.room_group_name)
         validated_data = await auto_serializer.apply_for_server_message()
-        await self.send_json(validated_data)
+        if not validated_data:
+            return
+
+        if wait:
+            await self.outbound.put(validated_data)
+            return
+
+        if self.outbound.offer(validated_data):
+            return
+
+        if self.outbound.overflows > settings.WS_MAX_OVERFLOWS:
+            logger.warning(f"Notification socket of user {self.user_id} is closed as too slow")
+            websocket_limiter_metrics.increment("slow_consumers_closed")
+            await self.close(code=4008)
+
+    def _is_rate_limited(self, content: Any) -> bool:
+        """
+            Take tokens for the frame from the bucket of the socket before it is validated.
+            A bulk ack costs a token per notification, at most the whole bucket,
+            so a valid bulk ack can always pass once the bucket is full.
+        """
+        notification_ids = content.get("notification_ids") if isinstance(content, dict) else None
+        cost = len(notification_ids) if isinstance(notification_ids, list) and notification_ids else 1
+
+        if self.frame_limiter.consume(min(cost, self.frame_limiter.capacity)):
+            self.rate_limit_strikes = 0
+            return False
+
+        self.rate_limit_strikes += 1
+        websocket_limiter_metrics.increment("rate_limited_frames")
+        return True
 
     async def receive_json(self, content: dict, **kwargs):
+        # every frame is limited, invalid ones and room subscriptions cost work as well
+        if self._is_rate_limited(content):
+            if self.rate_limit_strikes >= settings.WS_RATE_LIMIT_STRIKES:
+                logger.warning(f"Notification socket of user {self.user_id} is closed as rate limited")
+                websocket_limiter_metrics.increment("rate_limited_closed")
+                await self.close(code=4029)
+            return
+
         auto_serializer = AutoSerializer(content, self.room_group_name)
         validated_data = await auto_serializer.apply_for_client_message()
+        if not validated_data:
+            return
+
+        if validated_data["type"] in ("room_join", "room_leave"):
+            await self._update_room_subscription(validated_data)
+            return
 
         client_error_builder = ClientErrorBuilder()
 
+        if validated_data["type"] == "notification_bulk_ack":
+            raw_ids = validated_data["notification_ids"]
+        elif validated_data["type"] == "notification_ack":
+            raw_ids = [validated_data["notification_id"]]
+        else:
+            client_error_builder.build("Only notification acknowledgements and room subscriptions are accepted")
+            await client_error_builder.send(self.room_group_name)
+            return
+
         try:
-            notification_id = ObjectId(validated_data["notification_id"])
+            notification_ids = [ObjectId(raw_id) for raw_id in raw_ids]
         except InvalidId:
             client_error_builder.build("Invalid notification_id was provided")
             await client_error_builder.send(self.room_group_name)
@@ -109,21 +303,121 @@ class NotificationConsumer(BaseCommunicationConsumer):
             await client_error_builder.send(self.room_group_name)
             return
 
-        notification = Notification.objects(pk=notification_id)
-        notification_obj = notification.first()
-        notification.update(
-            __raw__={
-                "$pull": {
-                    "receivers": {"user_id": self.user_id}
-                }
-            }
-        )
-
-        if not notification_obj.reload().receivers:
-            notification_obj.delete()
+        if len(notification_ids) == 1:
+            await mongo_sync_to_async(NotificationService.ack)(notification_ids[0], self.user_id)
+        else:
+            await mongo_sync_to_async(NotificationService.ack_many)(notification_ids, self.user_id)
 
     async def notify_user(self, event: dict):
         await self._verify_and_send(event)
 
     async def chat_notification(self, event: dict):
         await self._verify_and_send(event)
+
+    async def chat_message(self, event: dict):
+        await self._verify_and_send(event)
+
+
+class ChatConsumer(BaseCommunicationConsumer):
+    """
+        Socket of a participant subscribed to one chat room.
+        Messages sent by the client are validated with ChatMessageSerializer,
+        persisted and broadcast to every socket of the room with one group send.
+        Notification sockets may subscribe to the same room group, see NotificationConsumer.
+    """
+
+    async def connect(self):
+        self.room_group_name = None
+
+        try:
+            access_token = self.scope['url_route']['kwargs']['access_token']
+            self.token_payload: dict = AccessToken(access_token).payload
+        except TokenError:
+            await self.close(code=4001)
+            return
+
+        try:
+            room: Room | None = await mongo_sync_to_async(get_room)(
+                self.scope['url_route']['kwargs']['room_id']
+            )
+        except InvalidId:
+            room = None
+
+        self.author = self._get_author(room)
+        if self.author is None:
+            await self.close(code=4003)
+            return
+
+        self.room_id = str(room.pk)
+        self.room_group_name = get_room_group_name(self.room_id)
+
+        await self.channel_layer.group_add(
+            self.room_group_name,
+            self.channel_name
+        )
+
+        await self.accept()
+
+    def _get_author(self, room: Room | None) -> dict | None:
+        """
+            Return namespace info of the requester if they are a participant of the room.
+        """
+        if room is None:
+            return None
+
+        for participant in room.participants:
+            if (
+                participant.user_id == self.token_payload.get("user_id")
+                and participant.namespace_id == self.token_payload.get("name_space_id")
+                and participant.namespace.value == self.token_payload.get("name_space_name")
+            ):
+                return {
+                    "user_id": participant.user_id,
+                    "namespace": participant.namespace.value,
+                    "namespace_id": participant.namespace_id,
+                }
+
+        return None
+
+    async def disconnect(self, code: int):
+        if self.room_group_name:
+            await self.channel_layer.group_discard(
+                self.room_group_name, self.channel_name
+            )
+
+    async def _client_error(self, message: str) -> None:
+        # errors are sent to this socket only, not to the whole room
+        await self.send_json({"type": "client_error", "message": message}, close=True)
+
+    def _persist(self, content: str) -> Message | dict:
+        serializer = ChatMessageSerializer(
+            data={"room": self.room_id, "author": self.author, "content": content},
+            context={"token_payload": self.token_payload}
+        )
+        if not serializer.is_valid():
+            return serializer.errors
+
+        return ChatService.send_message(get_room(self.room_id), serializer.data)
+
+    async def receive_json(self, content: dict, **kwargs):
+        auto_serializer = AutoSerializer(content, self.room_group_name)
+        try:
+            validated_data = await auto_serializer.apply_serializer()
+        except BaseNotificationException as exc:
+            await self._client_error(exc.message)
+            return
+
+        if validated_data["type"] != "chat_send":
+            await self._client_error("Only 'chat_send' messages are accepted")
+            return
+
+        # the message is broadcast to the room by ChatService
+        message = await mongo_sync_to_async(self._persist)(validated_data["content"])
+        if not isinstance(message, Message):
+            await self._client_error(f"Invalid message: {message}")
+
+    async def chat_message(self, event: dict):
+        auto_serializer = AutoSerializer(event, self.room_group_name)
+        validated_data = await auto_serializer.apply_for_server_message()
+        if validated_data:
+            await self.send_json(validated_data)
@@ -0,0 +1,18 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+# mongoengine is a blocking driver, consumers run its calls in these threads
+# so a slow query does not stall every other socket of the worker
+mongo_executor = ThreadPoolExecutor(
+    max_workers=settings.MONGO_EXECUTOR_WORKERS,
+    thread_name_prefix="mongo"
+)
+
+mongo_sync_to_async = partial(
+    sync_to_async,
+    thread_sensitive=False,
+    executor=mongo_executor
+)
@@ -1,8 +1,28 @@
+from bson.objectid import ObjectId
+from django.conf import settings
 from investors.models import Investor
+from mongoengine.queryset.visitor import Q
+from pymongo import UpdateOne
 from rest_framework.serializers import ValidationError
 from startups.models import Startup
 
-from .mongo_models import NamespaceEnum, Room
+from forum.cache import TTLCache
+
+from .mongo_models import Message, NamespaceEnum, Room
+
+# (user_id, namespace, namespace_id) -> whether the user owns the namespace,
+# invalidated by Startup / Investor signals
+namespace_ownership_cache = TTLCache(
+    maxsize=settings.NAMESPACE_OWNERSHIP_CACHE_SIZE,
+    ttl=settings.NAMESPACE_OWNERSHIP_CACHE_TTL
+)
+
+
+def get_room_group_name(room_id) -> str:
+    """
+        Channel layer group of sockets subscribed to the chat room.
+    """
+    return f"room_{room_id}"
 
 
 def generate_room_name(
@@ -22,24 +42,223 @@ def generate_room_name(
     return room_name
 
 
-def is_namespace_info_correct(namespace_info: dict) -> bool:
-    user_id = namespace_info.get("user_id")
-    namespace = namespace_info.get("namespace")
-    namespace_id = namespace_info.get("namespace_id")
+def invalidate_namespace_ownership(user_id: int, namespace: str, namespace_id: int) -> None:
+    namespace_ownership_cache.delete((user_id, namespace, namespace_id))
+
+
+def _is_namespace_owner(user_id: int, namespace: str, namespace_id: int) -> bool:
+    key = (user_id, namespace, namespace_id)
+    is_owner = namespace_ownership_cache.get(key)
+    if is_owner is not None:
+        return is_owner
 
     if namespace == NamespaceEnum.STARTUP.value:
-        if not Startup.objects.filter(
+        is_owner = Startup.objects.filter(
             user__user_id=user_id,
             startup_id=namespace_id
-        ).exists():
-            raise ValidationError("Startup does not exist.")
-    elif namespace == NamespaceEnum.INVESTOR.value:
-        if not Investor.objects.filter(
+        ).exists()
+    else:
+        is_owner = Investor.objects.filter(
             user__user_id=user_id,
             investor_id=namespace_id
-        ).exists():
-            raise ValidationError("Investor does not exist.")
-    else:
-        raise ValidationError("Invalid namespace.") 
-    
+        ).exists()
+
+    namespace_ownership_cache.set(key, is_owner)
+    return is_owner
+
+
+def is_namespace_info_correct(namespace_info: dict, token_payload: dict | None = None) -> bool:
+    """
+        Verify that the namespace belongs to the user.
+
+    Args:
+        namespace_info (dict): user_id, namespace and namespace_id to verify
+        token_payload (dict, optional): payload of the requester access token. Defaults to None.
+        Namespace claims of the token were verified on namespace selection,
+        so the namespace of the requester is trusted without a database lookup.
+
+    Raises:
+        ValidationError: if the namespace does not exist or belongs to another user
+    """
+    namespace = namespace_info.get("namespace")
+
+    if namespace not in (NamespaceEnum.STARTUP.value, NamespaceEnum.INVESTOR.value):
+        raise ValidationError("Invalid namespace.")
+
+    try:
+        user_id = int(namespace_info.get("user_id"))
+        namespace_id = int(namespace_info.get("namespace_id"))
+    except (TypeError, ValueError):
+        raise ValidationError("Invalid namespace info.")
+
+    if token_payload and (
+        token_payload.get("user_id") == user_id
+        and token_payload.get("name_space_name") == namespace
+        and token_payload.get("name_space_id") == namespace_id
+    ):
+        return True
+
+    if not _is_namespace_owner(user_id, namespace, namespace_id):
+        raise ValidationError(f"{namespace.capitalize()} does not exist.")
+
     return True
+
+
+def filter_by_cursor(
+    queryset,
+    field: str,
+    cursor_value,
+    cursor_id: ObjectId,
+    *,
+    descending: bool,
+    id_field: str = "id"
+):
+    """
+        Keep documents placed after the cursor in (field, id_field) order.
+    """
+    operator = "lt" if descending else "gt"
+
+    return queryset.filter(
+        Q(**{f"{field}__{operator}": cursor_value})
+        | Q(**{field: cursor_value, f"{id_field}__{operator}": cursor_id})
+    )
+
+
+def paginate_messages(
+    room_id: ObjectId,
+    *,
+    limit: int,
+    before: ObjectId | None = None,
+    after: ObjectId | None = None
+) -> list[dict]:
+    """
+        Return a page of room messages in chronological order using keyset pagination.
+
+    Args:
+        room_id (ObjectId): id of the room
+        limit (int): max number of messages in the page
+        before (ObjectId, optional): return messages sent before this message. Defaults to None.
+        after (ObjectId, optional): return messages sent after this message. Defaults to None.
+        If neither `before` nor `after` is provided the latest messages are returned.
+
+    Raises:
+        ValidationError: if the cursor message does not belong to the room
+
+    Returns:
+        list[dict]: raw message documents
+    """
+    cursor_id = before or after
+    messages = Message.objects(room=room_id)
+
+    if cursor_id:
+        cursor = Message.objects(id=cursor_id, room=room_id).only("created_at").first()
+        if not cursor:
+            raise ValidationError("Invalid cursor.")
+
+        messages = filter_by_cursor(
+            messages,
+            "created_at",
+            cursor.created_at,
+            cursor_id,
+            descending=not after
+        )
+
+    if after:
+        return list(messages.order_by("created_at", "id").limit(limit).as_pymongo())
+
+    page = list(messages.order_by("-created_at", "-id").limit(limit).as_pymongo())
+    page.reverse()
+
+    return page
+
+
+def paginate_rooms(
+    namespace: str,
+    namespace_id: int,
+    *,
+    limit: int,
+    before: ObjectId | None = None
+) -> list[dict]:
+    """
+        Return a page of namespace rooms, most recently active first.
+
+    Args:
+        namespace (str): namespace name of the participant
+        namespace_id (int): namespace id of the participant
+        limit (int): max number of rooms in the page
+        before (ObjectId, optional): return rooms which were active before this room. Defaults to None.
+
+    Raises:
+        ValidationError: if the cursor room does not belong to the namespace
+
+    Returns:
+        list[dict]: raw room documents
+    """
+    rooms = Room.of_namespace(namespace, namespace_id)
+
+    if before:
+        # raw document, mongoengine would fill a missing `last_activity_at` with now
+        cursor = rooms.filter(id=before).only("last_activity_at").as_pymongo().first()
+        if not cursor or not cursor.get("last_activity_at"):
+            raise ValidationError("Invalid cursor.")
+
+        rooms = filter_by_cursor(
+            rooms,
+            "last_activity_at",
+            cursor["last_activity_at"],
+            before,
+            descending=True
+        )
+
+    return list(rooms.order_by("-last_activity_at", "-id").limit(limit).as_pymongo())
+
+
+def backfill_room_activity(batch_size: int) -> int:
+    """
+        Set `last_activity_at` of rooms created before the field was added
+        to the time of their last message or creation, rooms without it are
+        never matched by `paginate_rooms` cursors.
+
+    Returns:
+        int: number of updated rooms
+    """
+    rooms = Room._get_collection()
+    messages = Message._get_collection()
+    updated = 0
+
+    while True:
+        batch = list(
+            rooms.find(
+                {"last_activity_at": None},
+                {"_id": True, "created_at": True, "last_message.created_at": True}
+            ).limit(batch_size)
+        )
+        if not batch:
+            break
+
+        room_ids = [room["_id"] for room in batch]
+        last_messages = {
+            row["_id"]: row["created_at"] for row in messages.aggregate([
+                {"$match": {"room": {"$in": room_ids}}},
+                {"$group": {"_id": "$room", "created_at": {"$max": "$created_at"}}}
+            ])
+        }
+
+        rooms.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": room["_id"], "last_activity_at": None},
+                    {"$set": {"last_activity_at": (
+                        last_messages.get(room["_id"])
+                        or room.get("last_message", {}).get("created_at")
+                        or room.get("created_at")
+                        or room["_id"].generation_time.replace(tzinfo=None)
+                    )}}
+                )
+                for room in batch
+            ],
+            ordered=False
+        )
+        updated += len(batch)
+
+    return updated
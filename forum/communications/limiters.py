@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+from forum.metrics import get_counters
+
+websocket_limiter_metrics = get_counters("websocket_limiter")
+
+
+class TokenBucket:
+    """
+        Token bucket refilled with `rate` tokens per second up to `capacity`.
+        Not thread-safe, every websocket owns its bucket and uses it from its event loop.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def consume(self, tokens: float = 1) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+        if self.tokens < tokens:
+            return False
+
+        self.tokens -= tokens
+        return True
+
+
+class OutboundQueue:
+    """
+        Bounded queue of frames waiting to be written to a websocket.
+
+        When a frame is offered to a full queue the client is too slow:
+        pending frames are dropped and replaced by `overflow_frame`, which tells
+        the client to fetch missed data via REST. Further frames are dropped
+        until the marker is written.
+    """
+
+    def __init__(self, maxsize: int, overflow_frame: dict) -> None:
+        self.queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=maxsize)
+        self.overflow_frame = overflow_frame
+        self.overflows = 0
+        self.degraded = False
+
+    def offer(self, frame: dict) -> bool:
+        """
+            Enqueue the frame without waiting.
+
+        Returns:
+            bool: False if the frame was dropped
+        """
+        if self.degraded:
+            websocket_limiter_metrics.increment("outbound_dropped")
+            return False
+
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        dropped = self.queue.qsize() + 1
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+        self.queue.put_nowait(self.overflow_frame)
+        self.degraded = True
+        self.overflows += 1
+
+        websocket_limiter_metrics.increment("outbound_dropped", dropped)
+        websocket_limiter_metrics.increment("outbound_overflows")
+
+        return False
+
+    async def put(self, frame: dict) -> None:
+        """
+            Enqueue the frame waiting for free space, used for frames produced by the socket itself.
+        """
+        await self.queue.put(frame)
+
+    async def get(self) -> dict:
+        frame = await self.queue.get()
+        if frame is self.overflow_frame:
+            self.degraded = False
+
+        return frame
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from communications.helpers import backfill_room_activity
+
+
+class Command(BaseCommand):
+    help = "Set last activity time of rooms created before it was tracked."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of rooms updated at a time."
+        )
+
+    def handle(self, *args, **options):
+        updated = backfill_room_activity(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} rooms."))
@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from communications.utils import BaseWSMessageBuilder
+
+RECEIVERS = (1, 100, 10_000)
+
+
+class LatencyChannelLayer(InMemoryChannelLayer):
+    """
+        In-memory channel layer emulating the network round trip of every group send.
+    """
+
+    def __init__(self, latency: float = 0, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.latency = latency
+
+    async def group_send(self, group: str, message: dict) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        await super().group_send(group, message)
+
+
+class BenchmarkBuilder(BaseWSMessageBuilder):
+    def build(self) -> None:
+        self.ws_message = {
+            "type": "notify_user",
+            "notification_id": "0" * 24,
+            "message": "benchmark",
+        }
+
+
+class Command(BaseCommand):
+    help = "Compare per-receiver and batched channel layer fan-out of a notification."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--receivers",
+            type=int,
+            nargs="+",
+            default=RECEIVERS,
+            help="Numbers of receivers to benchmark."
+        )
+        parser.add_argument(
+            "--latency-ms",
+            type=float,
+            default=0.5,
+            help="Emulated channel layer round trip in milliseconds."
+        )
+
+    def handle(self, *args, **options):
+        channel_layers = {
+            "default": {
+                "BACKEND": f"{__name__}.LatencyChannelLayer",
+                "CONFIG": {"latency": options["latency_ms"] / 1000},
+            },
+        }
+
+        with override_settings(CHANNEL_LAYERS=channel_layers):
+            for receivers in options["receivers"]:
+                self.benchmark(receivers)
+
+    @staticmethod
+    async def prepare(room_names: list[str]) -> None:
+        channel_layer = get_channel_layer()
+        await channel_layer.flush()
+
+        for room_name in room_names:
+            await channel_layer.group_add(room_name, f"{room_name}.channel")
+
+    def benchmark(self, receivers: int) -> None:
+        room_names = [f"notifications_{user_id}" for user_id in range(receivers)]
+
+        builder = BenchmarkBuilder()
+        builder.build()
+
+        async_to_sync(self.prepare)(room_names)
+        started = time.perf_counter()
+        for room_name in room_names:
+            async_to_sync(builder.send)(room_name)
+        per_receiver = time.perf_counter() - started
+
+        async_to_sync(self.prepare)(room_names)
+        started = time.perf_counter()
+        failures = async_to_sync(builder.send_many)(room_names)
+        batched = time.perf_counter() - started
+
+        self.stdout.write(
+            f"receivers={receivers} "
+            f"per-receiver={per_receiver * 1000:.1f}ms "
+            f"batched={batched * 1000:.1f}ms "
+            f"speedup={per_receiver / batched:.1f}x "
+            f"failures={len(failures)}"
+        )
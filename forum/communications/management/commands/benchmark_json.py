@@ -0,0 +1,91 @@
+import json
+import timeit
+from datetime import datetime
+
+from bson.objectid import ObjectId
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from communications.mongo_models import NamespaceEnum
+from forum import encoders
+from forum.renderers import FastJSONRenderer
+
+
+def notification_payload() -> dict:
+    return {
+        "type": "notify_user",
+        "notification_id": str(ObjectId()),
+        "initiator": {"user_id": 2, "namespace": "startup", "namespace_id": 3},
+        "message": "Startup profile was updated",
+        "created_at": str(datetime.utcnow()),
+    }
+
+
+def startup_list_payload(size: int = 50) -> list[dict]:
+    return [
+        {
+            "startup_id": startup_id,
+            "user": startup_id,
+            "name": f"Startup {startup_id}",
+            "location": "Kyiv, Ukraine",
+            "description": "Short description of the startup " * 5,
+            "contacts": {"phone": "+380000000000", "email": f"startup{startup_id}@gmail.com"},
+            "size": {"size_id": 1, "name": "small", "people_count_min": 1, "people_count_max": 10},
+            "created_at": "2024-07-25T09:24:00.123Z",
+        }
+        for startup_id in range(size)
+    ]
+
+
+def mongo_notification_payload() -> dict:
+    return {
+        "_id": ObjectId(),
+        "initiator": {"user_id": 2, "namespace": NamespaceEnum.STARTUP, "namespace_id": 3},
+        "message": "Startup profile was updated",
+        "created_at": datetime.utcnow(),
+    }
+
+
+class Command(BaseCommand):
+    help = "Compare stdlib / DRF JSON encoding with forum.encoders on typical payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--number", type=int, default=10_000, help="Encodings per payload.")
+
+    def handle(self, *args, **options):
+        number = options["number"]
+        self.stdout.write(f"orjson: {'enabled' if encoders.orjson else 'not installed'}")
+
+        websocket_payload = notification_payload()
+        self.compare(
+            "websocket notification",
+            lambda: json.dumps(websocket_payload),
+            lambda: encoders.dumps_str(websocket_payload),
+            number
+        )
+
+        startups = startup_list_payload()
+        drf_renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+        self.compare(
+            "startup list response",
+            lambda: drf_renderer.render(startups),
+            lambda: fast_renderer.render(startups),
+            number // 10 or 1
+        )
+
+        document = mongo_notification_payload()
+        self.compare(
+            "raw notification document",
+            lambda: drf_renderer.render(json.loads(encoders.JSONEncoder().encode(document))),
+            lambda: fast_renderer.render(document),
+            number
+        )
+
+    def compare(self, name: str, baseline, fast, number: int) -> None:
+        baseline_time = timeit.timeit(baseline, number=number) / number
+        fast_time = timeit.timeit(fast, number=number) / number
+
+        self.stdout.write(
+            f"{name}: baseline={baseline_time * 1e6:.1f}us "
+            f"fast={fast_time * 1e6:.1f}us speedup={baseline_time / fast_time:.1f}x"
+        )
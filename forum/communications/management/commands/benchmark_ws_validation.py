@@ -0,0 +1,61 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from communications.utils import AutoSerializer
+
+SAMPLES = {
+    "notify_user": {
+        "type": "notify_user",
+        "notification_id": "66a21e4e4b1c2d0a8c7e9f10",
+        "initiator": {"user_id": 2, "namespace": "startup", "namespace_id": 3},
+        "message": "Startup profile was updated",
+        "created_at": "2024-07-25 09:24:00.000000",
+    },
+    "chat_notification": {
+        "type": "chat_notification",
+        "notification_id": "66a21e4e4b1c2d0a8c7e9f10",
+        "initiator": {"user_id": 2, "namespace": "investor", "namespace_id": 3},
+        "message": "Message was sent",
+        "created_at": "2024-07-25 09:24:00.000000",
+        "message_id": "66a21e4e4b1c2d0a8c7e9f11",
+    },
+    "notification_ack": {
+        "type": "notification_ack",
+        "notification_id": "66a21e4e4b1c2d0a8c7e9f10",
+    },
+    "notification_bulk_ack": {
+        "type": "notification_bulk_ack",
+        "notification_ids": ["66a21e4e4b1c2d0a8c7e9f10"] * 20,
+    },
+}
+
+
+class Command(BaseCommand):
+    help = "Compare DRF serializers and compiled schemas validating websocket messages."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--number", type=int, default=10_000, help="Validations per message type.")
+
+    def handle(self, *args, **options):
+        number = options["number"]
+
+        for message_type, message in SAMPLES.items():
+            serializer_class = AutoSerializer.MESSAGE_TYPES[message_type]
+            schema = AutoSerializer.SCHEMAS[message_type]
+
+            def apply_serializer():
+                serializer = serializer_class(data=message)
+                serializer.is_valid()
+                return serializer.validated_data
+
+            drf = timeit.timeit(apply_serializer, number=number) / number
+            if schema is None:
+                self.stdout.write(f"{message_type}: drf={drf * 1e6:.1f}us compiled=n/a")
+                continue
+
+            compiled = timeit.timeit(lambda: schema.validate(message), number=number) / number
+            self.stdout.write(
+                f"{message_type}: drf={drf * 1e6:.1f}us "
+                f"compiled={compiled * 1e6:.1f}us speedup={drf / compiled:.1f}x"
+            )
@@ -1,6 +1,7 @@
 from datetime import datetime
 from enum import Enum
 
+from django.conf import settings
 from mongoengine import CASCADE, Document, EmbeddedDocument, fields
 
 
@@ -12,6 +13,38 @@ class BaseTimestampModel(Document):
     }
 
 
+# name of the `created_at` index of notification collections, the index is
+# a TTL one when NOTIFICATION_TTL_DAYS is set, see `sync_notification_indexes`
+NOTIFICATION_EXPIRY_INDEX = 'notification_created_at'
+
+
+def notification_expiry_seconds() -> int | None:
+    if not settings.NOTIFICATION_TTL_DAYS:
+        return None
+
+    return settings.NOTIFICATION_TTL_DAYS * 24 * 60 * 60
+
+
+def notification_ttl_indexes() -> list[dict]:
+    """
+        Index on `created_at` removing notifications after NOTIFICATION_TTL_DAYS.
+        A plain index is used when expiry is disabled, archival still needs it.
+        Options of an existing index are not changed by mongoengine, run
+        `manage.py sync_notification_indexes` after changing the setting.
+    """
+    expire_after_seconds = notification_expiry_seconds()
+    if expire_after_seconds is None:
+        return [{'fields': ['created_at'], 'name': NOTIFICATION_EXPIRY_INDEX}]
+
+    return [
+        {
+            'fields': ['created_at'],
+            'name': NOTIFICATION_EXPIRY_INDEX,
+            'expireAfterSeconds': expire_after_seconds
+        }
+    ]
+
+
 class NamespaceEnum(Enum):
     STARTUP = "startup"
     INVESTOR = "investor"
@@ -48,14 +81,56 @@ class NamespaceInfo(EmbeddedDocument):
 
 
 class Notification(BaseTimestampModel):
+    """
+        Notification payload shared by all its receivers.
+        State of every receiver is stored in NotificationInbox.
+    """
     initiator = fields.EmbeddedDocumentField(NamespaceInfo, required=True)
-    receivers = fields.EmbeddedDocumentListField(NamespaceInfo, required=True)
     message = fields.StringField(required=True, max_length=255)
+    # number of receivers the notification was pushed to, it is not changed by acks,
+    # so they do not write the shared document (stored under its former name)
+    receivers_count = fields.IntField(required=True, min_value=0, db_field='pending_receivers')
+
+    meta = {
+        'indexes': notification_ttl_indexes()
+    }
 
     def __str__(self) -> str:
         return (
             f"{self.__class__.__name__}(initiator={self.initiator} "
-            f"receivers={self.receivers} message={self.message})"
+            f"receivers_count={self.receivers_count} message={self.message})"
+        )
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+class NotificationInbox(BaseTimestampModel):
+    """
+        Per-receiver state of a notification, written with one `insert_many`.
+        Reads and acks of a user touch only their own rows, so notifications
+        with many receivers do not become write hotspots.
+    """
+    notification = fields.ObjectIdField(required=True)
+    user_id = fields.LongField(required=True)
+    namespace = fields.EnumField(NamespaceEnum, required=True)
+    namespace_id = fields.LongField(required=True)
+    # number of coalesced events, see communications.coalescing
+    count = fields.IntField(default=1, min_value=1)
+
+    meta = {
+        'collection': 'notification_inbox',
+        'indexes': [
+            # inbox of the receiver, newest first
+            {'fields': ['user_id', '-created_at', '-notification']},
+            {'fields': ['notification', 'user_id'], 'unique': True}
+        ] + notification_ttl_indexes()
+    }
+
+    def __str__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(notification={self.notification} "
+            f"user_id={self.user_id} namespace={self.namespace} namespace_id={self.namespace_id})"
         )
 
     def __repr__(self) -> str:
@@ -79,24 +154,130 @@ class NotificationPreferences(UserBaseModel):
         ]
     }
 
+    def save(self, *args, **kwargs):
+        document = super().save(*args, **kwargs)
+        self._invalidate_cache()
+        return document
+
+    def delete(self, *args, **kwargs):
+        super().delete(*args, **kwargs)
+        self._invalidate_cache()
+
+    def _invalidate_cache(self) -> None:
+        from .preferences import preferences_resolver
+
+        preferences_resolver.invalidate(self.user_id)
+
     @classmethod
     def is_ws_enabled(cls, user_id, notification_type):
-        preference = cls.objects(user_id=user_id, notification_types=notification_type.value).first()
-        return preference.ws_enabled if preference else False
+        from .preferences import preferences_resolver
+
+        preference = preferences_resolver.get(user_id)
+        return bool(preference and preference.ws_enabled(notification_type))
 
     @classmethod
     def is_email_enabled(cls, user_id, notification_type):
-        preference = cls.objects(user_id=user_id, notification_types=notification_type.value).first()
-        return preference.email_enabled if preference else False
+        from .preferences import preferences_resolver
+
+        preference = preferences_resolver.get(user_id)
+        return bool(preference and preference.email_enabled(notification_type))
 
     @classmethod
     def has_preferences(cls, user_id, notification_type):
-        return cls.objects(user_id=user_id, notification_types_name=notification_type.value).first() is not None
+        from .preferences import preferences_resolver
+
+        preference = preferences_resolver.get(user_id)
+        return bool(preference and preference.has(notification_type))
+
+
+class LastMessage(EmbeddedDocument):
+    PREVIEW_LENGTH = 255
+
+    message_id = fields.ObjectIdField(required=True)
+    author = fields.EmbeddedDocumentField(NamespaceInfo, required=True)
+    content = fields.StringField(required=True, max_length=PREVIEW_LENGTH)
+    created_at = fields.DateTimeField(required=True)
 
 
 class Room(BaseTimestampModel):
     name = fields.StringField(max_length=128, unique=True, required=True)
     participants = fields.EmbeddedDocumentListField(NamespaceInfo, required=True, max_length=2)
+    last_activity_at = fields.DateTimeField(default=datetime.utcnow)
+    last_message = fields.EmbeddedDocumentField(LastMessage)
+    # number of unread messages per participant, see `participant_key`
+    unread_counters = fields.MapField(fields.IntField(min_value=0), default=dict)
+
+    meta = {
+        'indexes': [
+            # multikey index used by participant lookups sorted by activity
+            {'fields': [
+                'participants.namespace',
+                'participants.namespace_id',
+                '-last_activity_at',
+                '-id'
+            ]}
+        ]
+    }
+
+    @classmethod
+    def of_namespace(cls, namespace: str, namespace_id: int):
+        return cls.objects(
+            __raw__={
+                "participants": {
+                    "$elemMatch": {
+                        "namespace": namespace,
+                        "namespace_id": namespace_id
+                    }
+                }
+            }
+        )
+
+    @staticmethod
+    def participant_key(namespace: NamespaceEnum | str, namespace_id: int) -> str:
+        if isinstance(namespace, NamespaceEnum):
+            namespace = namespace.value
+        return f"{namespace}_{namespace_id}"
+
+    def register_message(self, message: "Message") -> None:
+        """
+            Atomically store the message summary and increment unread counters
+            of all participants except the author.
+        """
+        author_key = self.participant_key(message.author.namespace, message.author.namespace_id)
+        receiver_keys = [
+            key for key in (
+                self.participant_key(participant.namespace, participant.namespace_id)
+                for participant in self.participants
+            )
+            if key != author_key
+        ]
+        last_message = LastMessage(
+            message_id=message.pk,
+            author=message.author,
+            content=message.content[:LastMessage.PREVIEW_LENGTH],
+            created_at=message.created_at
+        )
+
+        update = {
+            "$set": {
+                "last_message": last_message.to_mongo(),
+                "last_activity_at": message.created_at
+            }
+        }
+        if receiver_keys:
+            update["$inc"] = {f"unread_counters.{key}": 1 for key in receiver_keys}
+
+        Room.objects(pk=self.pk).update_one(__raw__=update)
+
+    @classmethod
+    def reset_unread_counter(cls, room_id, namespace: NamespaceEnum | str, namespace_id: int) -> None:
+        cls.objects(pk=room_id).update_one(
+            __raw__={
+                "$set": {
+                    f"unread_counters.{cls.participant_key(namespace, namespace_id)}": 0
+                }
+            }
+        )
 
     def __str__(self) -> str:
         return f"{self.__class__.__name__}(name={self.name} participants={self.participants})"
@@ -111,6 +292,13 @@ class Message(BaseTimestampModel):
     author = fields.EmbeddedDocumentField(NamespaceInfo, required=True)
     content = fields.StringField(required=True)
 
+    meta = {
+        'indexes': [
+            # `id` breaks ties between messages created at the same moment
+            {'fields': ['room', 'created_at', 'id']}
+        ]
+    }
+
     def __str__(self) -> str:
         return (
             f"{self.__class__.__name__}(room={self.room} author={self.author} "
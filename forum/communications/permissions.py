@@ -1,8 +1,8 @@
-from bson.objectid import ObjectId
 from bson.errors import InvalidId
 from rest_framework.permissions import BasePermission
 
-from communications.mongo_models import Room, NamespaceEnum
+from communications.cache import get_room
+from communications.mongo_models import NamespaceEnum
 from users.permissions import get_token_payload_from_cookies
 
 
@@ -21,9 +21,11 @@ class IsParticipantOfConversation(BasePermission):
             return False
         
         try:
-            conversation_id = ObjectId(conversation_id)
-            conversation = Room.objects.get(id=conversation_id)
-        except (InvalidId, Room.DoesNotExist):
+            conversation = get_room(conversation_id, request)
+        except InvalidId:
+            return False
+
+        if not conversation:
             return False
 
         if any(participant.user_id == user_id and 
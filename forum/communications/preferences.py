@@ -0,0 +1,116 @@
+import threading
+from dataclasses import dataclass
+from typing import Iterable
+
+from django.conf import settings
+
+from forum.cache import TTLCache
+
+from .mongo_models import NotificationPreferences, NotificationTypeEnum
+
+
+@dataclass(frozen=True, slots=True)
+class UserPreferences:
+    user_id: int
+    # notification type -> (ws_enabled, email_enabled) of the documents listing the type
+    channels: dict[str, tuple[bool, bool]]
+
+    @classmethod
+    def from_document(cls, document: dict) -> "UserPreferences":
+        flags = (document.get("ws_enabled", True), document.get("email_enabled", True))
+
+        return cls(
+            user_id=document["user_id"],
+            channels={
+                notification_type["name"]: flags
+                for notification_type in document.get("notification_types", [])
+            }
+        )
+
+    def merge(self, other: "UserPreferences") -> "UserPreferences":
+        """
+            Combine two documents of the user, `user_id` is not unique in the collection.
+            A channel is enabled for a type if any document listing the type enables it.
+        """
+        channels = dict(self.channels)
+        for name, (ws_enabled, email_enabled) in other.channels.items():
+            current_ws, current_email = channels.get(name, (False, False))
+            channels[name] = (current_ws or ws_enabled, current_email or email_enabled)
+
+        return UserPreferences(user_id=self.user_id, channels=channels)
+
+    def has(self, notification_type: NotificationTypeEnum) -> bool:
+        return notification_type.value in self.channels
+
+    def ws_enabled(self, notification_type: NotificationTypeEnum) -> bool:
+        return self.channels.get(notification_type.value, (False, False))[0]
+
+    def email_enabled(self, notification_type: NotificationTypeEnum) -> bool:
+        return self.channels.get(notification_type.value, (False, False))[1]
+
+
+class PreferencesResolver:
+    """
+        Read-through cache of whole user preference documents.
+
+        Writes through NotificationPreferences.save / delete invalidate the user entry
+        of this process and bump the generation, so a load which raced with a write
+        is not cached. Other processes see the change once the entry expires.
+    """
+
+    PROJECTION = ("user_id", "notification_types", "ws_enabled", "email_enabled")
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> UserPreferences | None:
+        return self.get_many([user_id]).get(user_id)
+
+    def get_many(self, user_ids: Iterable[int]) -> dict[int, UserPreferences]:
+        """
+            Return preferences of the users with at most one query for the missing ones.
+            Users without preferences are absent in the result.
+        """
+        found: dict[int, UserPreferences] = {}
+        missing: list[int] = []
+
+        for user_id in set(user_ids):
+            # False marks users known to have no preferences
+            preferences = self.cache.get(user_id)
+            if preferences is None:
+                missing.append(user_id)
+            elif preferences is not False:
+                found[user_id] = preferences
+
+        if not missing:
+            return found
+
+        generation = self._generation
+        loaded: dict[int, UserPreferences] = {}
+        for document in (
+            NotificationPreferences.objects(user_id__in=missing).only(*self.PROJECTION).as_pymongo()
+        ):
+            preferences = UserPreferences.from_document(document)
+            if preferences.user_id in loaded:
+                preferences = loaded[preferences.user_id].merge(preferences)
+            loaded[preferences.user_id] = preferences
+
+        with self._lock:
+            if generation == self._generation:
+                for user_id in missing:
+                    self.cache.set(user_id, loaded.get(user_id, False))
+
+        return found | loaded
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._generation += 1
+            self.cache.delete(user_id)
+
+
+preferences_resolver = PreferencesResolver(
+    maxsize=settings.NOTIFICATION_PREFERENCES_CACHE_SIZE,
+    ttl=settings.NOTIFICATION_PREFERENCES_CACHE_TTL
+)
@@ -0,0 +1,214 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from django.core.validators import (
+    MaxLengthValidator,
+    MinLengthValidator,
+    ProhibitNullCharactersValidator,
+)
+from rest_framework import fields as drf_fields
+from rest_framework.serializers import Serializer
+from rest_framework.validators import ProhibitSurrogateCharactersValidator
+
+_MISSING = object()
+
+_SURROGATES = re.compile(r"[\ud800-\udfff]")
+
+# validators added by DRF from field arguments, they are compiled into the field rules
+COMPILED_VALIDATORS = (
+    MaxLengthValidator,
+    MinLengthValidator,
+    ProhibitNullCharactersValidator,
+    ProhibitSurrogateCharactersValidator,
+)
+
+
+class SchemaError(Exception):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class FieldRule:
+    name: str
+    required: bool
+    allow_null: bool
+    default: Any
+    validate: Callable[[Any], Any]
+
+
+def _compile_char(field: drf_fields.CharField) -> Callable[[Any], str]:
+    trim_whitespace = field.trim_whitespace
+    allow_blank = field.allow_blank
+    max_length = field.max_length
+    min_length = field.min_length
+
+    def validate(value: Any) -> str:
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise SchemaError(f"'{field.field_name}' should be a string")
+
+        value = str(value)
+        if trim_whitespace:
+            value = value.strip()
+
+        if not value and not allow_blank:
+            raise SchemaError(f"'{field.field_name}' may not be blank")
+        if "\x00" in value:
+            raise SchemaError(f"'{field.field_name}' may not contain null characters")
+        if _SURROGATES.search(value):
+            raise SchemaError(f"'{field.field_name}' may not contain surrogate characters")
+        if max_length is not None and len(value) > max_length:
+            raise SchemaError(f"'{field.field_name}' is too long")
+        if min_length is not None and len(value) < min_length:
+            raise SchemaError(f"'{field.field_name}' is too short")
+
+        return value
+
+    return validate
+
+
+def _compile_dict(field: drf_fields.DictField) -> Callable[[Any], dict]:
+    child = _compile_child(field.child)
+    allow_empty = getattr(field, "allow_empty", True)
+
+    def validate(value: Any) -> dict:
+        if not isinstance(value, dict):
+            raise SchemaError(f"'{field.field_name}' should be a dictionary")
+        if not value and not allow_empty:
+            raise SchemaError(f"'{field.field_name}' may not be empty")
+
+        if child is None:
+            return {str(key): item for key, item in value.items()}
+
+        return {str(key): child(item) for key, item in value.items()}
+
+    return validate
+
+
+def _compile_list(field: drf_fields.ListField) -> Callable[[Any], list]:
+    child = _compile_child(field.child)
+    allow_empty = field.allow_empty
+    max_length = field.max_length
+    min_length = field.min_length
+
+    def validate(value: Any) -> list:
+        if isinstance(value, (str, dict)) or not hasattr(value, "__iter__"):
+            raise SchemaError(f"'{field.field_name}' should be a list")
+
+        value = list(value)
+        if not value and not allow_empty:
+            raise SchemaError(f"'{field.field_name}' may not be empty")
+        if max_length is not None and len(value) > max_length:
+            raise SchemaError(f"'{field.field_name}' has too many items")
+        if min_length is not None and len(value) < min_length:
+            raise SchemaError(f"'{field.field_name}' has too few items")
+
+        if child is None:
+            return value
+
+        return [child(item) for item in value]
+
+    return validate
+
+
+def _compile_child(field: drf_fields.Field) -> Callable[[Any], Any] | None:
+    """
+        Return the validator of a container child, None if the child accepts anything.
+    """
+    if type(field) is drf_fields._UnvalidatedField:
+        return None
+
+    return _compile_field(field)
+
+
+COMPILERS: dict[type[drf_fields.Field], Callable] = {
+    drf_fields.CharField: _compile_char,
+    drf_fields.DictField: _compile_dict,
+    drf_fields.ListField: _compile_list,
+}
+
+
+def _compile_field(field: drf_fields.Field) -> Callable[[Any], Any]:
+    # exact type, subclasses (e.g. EmailField) add validation which is not compiled
+    compiler = COMPILERS.get(type(field))
+    custom_validators = [
+        validator for validator in field.validators
+        if not isinstance(validator, COMPILED_VALIDATORS)
+    ]
+    if compiler is None or custom_validators:
+        raise TypeError(f"{type(field).__name__} can not be compiled")
+
+    return compiler(field)
+
+
+class CompiledSchema:
+    """
+        Validator of plain websocket messages compiled once from a DRF serializer.
+        Validated data is the same as `serializer.validated_data`:
+        undeclared keys are dropped, values are converted by the field rules.
+    """
+
+    __slots__ = ("serializer_class", "rules")
+
+    def __init__(self, serializer_class: type[Serializer]) -> None:
+        fields = serializer_class().fields
+
+        if serializer_class.validate is not Serializer.validate or any(
+            hasattr(serializer_class, f"validate_{name}") for name in fields
+        ):
+            raise TypeError(f"{serializer_class.__name__} has validation methods")
+
+        self.serializer_class = serializer_class
+        self.rules = tuple(
+            FieldRule(
+                name=name,
+                required=field.required,
+                allow_null=field.allow_null,
+                default=_MISSING if field.default is drf_fields.empty else field.default,
+                validate=_compile_field(field)
+            )
+            for name, field in fields.items()
+            if not field.read_only
+        )
+
+    def validate(self, data: Any) -> dict:
+        """
+            Return validated data of the message.
+
+        Raises:
+            SchemaError: if data is invalid
+        """
+        if not isinstance(data, dict):
+            raise SchemaError("Message should be a dictionary")
+
+        validated = {}
+        for rule in self.rules:
+            value = data.get(rule.name, _MISSING)
+
+            if value is _MISSING:
+                if rule.required:
+                    raise SchemaError(f"'{rule.name}' is required")
+                if rule.default is not _MISSING:
+                    validated[rule.name] = rule.default() if callable(rule.default) else rule.default
+                continue
+
+            if value is None:
+                if not rule.allow_null:
+                    raise SchemaError(f"'{rule.name}' may not be null")
+                validated[rule.name] = None
+                continue
+
+            validated[rule.name] = rule.validate(value)
+
+        return validated
+
+
+def compile_schema(serializer_class: type[Serializer]) -> CompiledSchema | None:
+    """
+        Return the compiled schema or None if the serializer has fields
+        or validation methods which can not be compiled.
+    """
+    try:
+        return CompiledSchema(serializer_class)
+    except TypeError:
+        return None
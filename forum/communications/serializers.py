@@ -1,9 +1,10 @@
 from bson.errors import InvalidId
-from bson.objectid import ObjectId
 from rest_framework import serializers
+from users.permissions import get_token_payload_from_cookies
 
+from .cache import get_room
 from .helpers import is_namespace_info_correct
-from .mongo_models import NamespaceEnum, Room
+from .mongo_models import NamespaceEnum
 from .validators import escape_xss
 
 
@@ -16,7 +17,19 @@ class NamespaceInfoSerializer(serializers.Serializer):
     namespace_id = serializers.CharField(required=True)
 
 
-class RoomSerializer(serializers.Serializer):
+class RequesterPayloadMixin:
+    def get_requester_payload(self) -> dict | None:
+        # websocket consumers have no request, they pass the verified payload
+        if self.context.get("token_payload") is not None:
+            return self.context["token_payload"]
+
+        request = self.context.get("request")
+        if request is None:
+            return None
+        return get_token_payload_from_cookies(request)
+
+
+class RoomSerializer(RequesterPayloadMixin, serializers.Serializer):
     participants = serializers.ListField()
 
     def validate(self, data):
@@ -30,7 +43,7 @@ class RoomSerializer(serializers.Serializer):
             if not serializer.is_valid():
                 raise serializers.ValidationError(f"Invalid participant: {serializer.errors}")
             
-            is_namespace_info_correct(participant)
+            is_namespace_info_correct(participant, self.get_requester_payload())
         
         namespaces = [p.get("namespace") for p in participants]
 
@@ -40,7 +53,7 @@ class RoomSerializer(serializers.Serializer):
         return data
 
 
-class ChatMessageSerializer(serializers.Serializer):
+class ChatMessageSerializer(RequesterPayloadMixin, serializers.Serializer):
     room = serializers.CharField(required=True)
     author = serializers.JSONField(required=True)
     content = serializers.CharField(required=True)
@@ -53,19 +66,18 @@ class ChatMessageSerializer(serializers.Serializer):
         author = data.get("author")
 
         try:
-            room_id = ObjectId(room_id)
+            room = get_room(room_id, self.context.get("request"))
         except InvalidId:
             raise serializers.ValidationError("Invalid room id.")
 
-        room_exists = Room.objects.filter(id=room_id).first()
-        if not room_exists:
+        if not room:
             raise serializers.ValidationError("Room does not exist.")
 
         serializer = NamespaceInfoSerializer(data=author)
         if not serializer.is_valid():
             raise serializers.ValidationError(f"Invalid author: {serializer.errors}")
 
-        is_namespace_info_correct(author)
+        is_namespace_info_correct(author, self.get_requester_payload())
         
         return data
 
@@ -96,6 +108,34 @@ class WSChatMessageSerializer(WSNotificationSerializer):
     message_id = serializers.CharField(required=True)
 
 
+class WSChatSendSerializer(serializers.Serializer):
+    type = serializers.CharField(required=True)
+    content = serializers.CharField(required=True)
+
+
+class WSChatRoomMessageSerializer(serializers.Serializer):
+    type = serializers.CharField(required=True)
+    message_id = serializers.CharField(required=True)
+    room = serializers.CharField(required=True)
+    author = serializers.DictField(required=True)
+    content = serializers.CharField(required=True)
+    created_at = serializers.CharField(required=True)
+
+
+class WSRoomSubscriptionSerializer(serializers.Serializer):
+    type = serializers.CharField(required=True)
+    room = serializers.CharField(required=True)
+
+
 class WSNotificationAckSerializer(serializers.Serializer):
     type = serializers.CharField(required=True)
     notification_id = serializers.CharField(required=True)
+
+
+class WSNotificationBulkAckSerializer(serializers.Serializer):
+    type = serializers.CharField(required=True)
+    notification_ids = serializers.ListField(
+        child=serializers.CharField(),
+        allow_empty=False,
+        max_length=100
+    )
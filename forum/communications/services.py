@@ -0,0 +1,53 @@
+from asgiref.sync import async_to_sync
+
+from forum.logging import logger
+
+from .helpers import get_room_group_name
+from .mongo_models import Message, NamespaceEnum, Room
+from .tasks import dispatch_notification
+from .utils import (
+    ChatMessageBuilder,
+    InvestorChatNotificationManager,
+    StartupChatNotificationManager,
+)
+
+
+class ChatService:
+    @staticmethod
+    def send_message(room: Room, data: dict) -> Message:
+        """
+            Persist a validated message (see ChatMessageSerializer), update the room,
+            broadcast it to sockets subscribed to the room with one group send
+            and dispatch the notification to the other participants.
+            Presence is not tracked, so sockets subscribed to the room receive
+            the notification as well, it is the inbox entry of the message.
+        """
+        message = Message(**(data | {"room": room}))
+        message.save()
+        room.register_message(message)
+
+        logger.info(f"Message sent: {message.id}")
+
+        builder = ChatMessageBuilder()
+        builder.build(message)
+        async_to_sync(builder.send)(get_room_group_name(room.pk))
+
+        if message.author.namespace == NamespaceEnum.STARTUP:
+            manager_class = StartupChatNotificationManager
+        else:
+            manager_class = InvestorChatNotificationManager
+
+        notification_message = (
+            f'Message: {message.id} was sent by {message.author.namespace} '
+            f'with id {message.author.namespace_id}'
+        )
+        # author ownership is verified by the serializer, the rest is done by a worker
+        dispatch_notification(
+            manager_class,
+            message.author.namespace_id,
+            notification_message,
+            room_id=str(room.pk),
+            message_id=str(message.pk)
+        )
+
+        return message
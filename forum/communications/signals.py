@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from investors.models import Investor
+from startups.models import Startup
+
+from .helpers import invalidate_namespace_ownership
+from .mongo_models import NamespaceEnum
+
+
+@receiver([post_save, post_delete], sender=Startup)
+def invalidate_startup_ownership(sender, instance: Startup, **kwargs):
+    invalidate_namespace_ownership(
+        instance.user_id,
+        NamespaceEnum.STARTUP.value,
+        instance.startup_id
+    )
+
+
+@receiver([post_save, post_delete], sender=Investor)
+def invalidate_investor_ownership(sender, instance: Investor, **kwargs):
+    invalidate_namespace_ownership(
+        instance.user_id,
+        NamespaceEnum.INVESTOR.value,
+        instance.investor_id
+    )
@@ -0,0 +1,96 @@
+from celery import shared_task
+from django.conf import settings
+from investors.models import Investor
+from kombu.exceptions import OperationalError
+from startups.models import Startup
+
+from forum.logging import logger
+
+from .cache import get_room
+from .mongo_models import NamespaceEnum
+from .utils import (
+    InvestorChatNotificationManager,
+    NotificationManager,
+    ProfileUpdateNotificationManager,
+    StartupChatNotificationManager,
+)
+
+# managers which can be dispatched to a worker, referenced by class name
+NOTIFICATION_MANAGERS: dict[str, type[NotificationManager]] = {
+    manager.__name__: manager for manager in (
+        ProfileUpdateNotificationManager,
+        InvestorChatNotificationManager,
+        StartupChatNotificationManager,
+    )
+}
+
+NAMESPACE_MODELS = {
+    NamespaceEnum.STARTUP.value: Startup,
+    NamespaceEnum.INVESTOR.value: Investor,
+}
+
+
+@shared_task
+def dispatch_notification_task(
+    manager: str,
+    initiator_id: int,
+    message: str,
+    room_id: str | None = None,
+    **kwargs
+) -> None:
+    manager_class = NOTIFICATION_MANAGERS[manager]
+    namespace_model = NAMESPACE_MODELS[manager_class.NAMESPACE_NAME.value]
+
+    initiator = namespace_model.objects.select_related("user").filter(pk=initiator_id).first()
+    if initiator is None:
+        logger.warning(f"{manager}: initiator {initiator_id} does not exist, notification is skipped")
+        return
+
+    if room_id is None:
+        notification_manager = manager_class(initiator)
+    else:
+        room = get_room(room_id)
+        if room is None:
+            logger.warning(f"{manager}: room {room_id} does not exist, notification is skipped")
+            return
+        notification_manager = manager_class(initiator, room)
+
+    notification_manager.push_notification(message, **kwargs)
+
+
+def dispatch_notification(
+    manager_class: type[NotificationManager],
+    initiator_id: int,
+    message: str,
+    room_id: str | None = None,
+    **kwargs
+) -> None:
+    """
+        Push the notification from a Celery worker, so the caller does not wait for
+        receivers resolution, emails and websocket fan-out.
+        The notification is pushed in process if NOTIFICATION_DISPATCH_ASYNC is disabled
+        or the broker is unavailable, the caller has already saved its data by then.
+
+    Args:
+        manager_class (type[NotificationManager]): one of NOTIFICATION_MANAGERS
+        initiator_id (int): id of the startup / investor which initiated the notification
+        message (str): notification message
+        room_id (str, optional): id of the chat room for chat managers. Defaults to None.
+        kwargs: passed to the notification builder, must be JSON serializable
+    """
+    task_kwargs = {
+        "manager": manager_class.__name__,
+        "initiator_id": initiator_id,
+        "message": message,
+        "room_id": room_id,
+        **kwargs
+    }
+
+    if settings.NOTIFICATION_DISPATCH_ASYNC:
+        try:
+            dispatch_notification_task.delay(**task_kwargs)
+            return
+        except OperationalError as exc:
+            logger.error(f"Broker is unavailable, {manager_class.__name__} is dispatched in process: {exc}")
+
+    dispatch_notification_task(**task_kwargs)
@@ -1,17 +1,58 @@
 import json
+import logging
 from abc import ABC
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
 from unittest import TestCase
+from unittest.mock import AsyncMock, MagicMock, call, patch
+
+from asgiref.sync import async_to_sync
+from django.test import override_settings
 
 from investors.models import Investor
+from kombu.exceptions import OperationalError
 from projects.models import Project, ProjectStatus, ProjectSubscription
+import redis
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.reverse import reverse
 from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import AccessToken
 from startups.models import Startup
 from users.models import CustomUser
 
-from communications.utils import StartupNotificationManager
+from bson.objectid import ObjectId
+
+from communications.cache import get_room, room_cache
+from communications.channel_layers import GroupOverflowFilter, channel_layer_metrics
+from communications.coalescing import LocalCoalescingBackend, NotificationCoalescer
+from communications.consumers import ChatConsumer, NotificationConsumer
+from communications.helpers import (
+    backfill_room_activity,
+    is_namespace_info_correct,
+    namespace_ownership_cache,
+)
+from communications.limiters import OutboundQueue, TokenBucket, websocket_limiter_metrics
+from communications.mongo_models import (
+    Message,
+    NamespaceEnum,
+    NamespaceInfo,
+    NotificationTypeEnum,
+    Room,
+)
+from communications.preferences import PreferencesResolver, UserPreferences
+from communications.schemas import SchemaError
+from communications.services import ChatService
+from communications.tasks import dispatch_notification
+from communications.utils import (
+    AutoSerializer,
+    NotificationBuilder,
+    ReceiversResolver,
+    StartupChatNotificationManager,
+    StartupNotificationManager,
+)
+from forum import encoders, metrics
+from forum.renderers import FastJSONRenderer
 from forum.tests_setup import UserSetupMixin
 
 
@@ -96,6 +137,7 @@ class NotificationTrigger(TestCase, NotificationListMixin):
         snm.push_notification(message)
 
 
+@override_settings(NOTIFICATION_DISPATCH_ASYNC=False)
 class ReceiveNotificationTestCase(UserSetupMixin, NotificationListMixin):
     TEST_NOTIFICATION: str = "Test notification"
 
@@ -169,3 +211,787 @@ class ReceiveNotificationTestCase(UserSetupMixin, NotificationListMixin):
         )
 
         self.notification_trigger.get_notifications()
+
+
+class ReceiversResolverTestCase(TestCase):
+    def setUp(self) -> None:
+        self.users = [
+            SimpleNamespace(user_id=1, first_name="first", email="first@gmail.com"),
+            SimpleNamespace(user_id=2, first_name="second", email="second@gmail.com"),
+            SimpleNamespace(user_id=3, first_name="third", email="third@gmail.com"),
+        ]
+        self.resolver = ReceiversResolver(
+            NamespaceEnum.INVESTOR,
+            NotificationTypeEnum.PROFILE_UPDATE
+        )
+
+    @patch("communications.utils.preferences_resolver.get_many")
+    def test_resolve_receivers_with_single_preferences_lookup(self, mock_get_many):
+        mock_get_many.return_value = {
+            1: UserPreferences(1, {"profile_update": (True, True)}),
+            2: UserPreferences(2, {"profile_update": (True, False), "new_message": (True, True)}),
+            3: UserPreferences(3, {"new_message": (True, True)}),
+        }
+
+        receivers, email_receivers = self.resolver.resolve(
+            (user, user.user_id * 10) for user in self.users
+        )
+
+        mock_get_many.assert_called_once()
+        self.assertEqual(set(mock_get_many.call_args.args[0]), {1, 2, 3})
+        self.assertEqual(
+            [(r.user_id, r.namespace, r.namespace_id) for r in receivers],
+            [(1, NamespaceEnum.INVESTOR, 10), (2, NamespaceEnum.INVESTOR, 20)]
+        )
+        self.assertEqual(email_receivers, [self.users[0]])
+
+    @patch("communications.utils.preferences_resolver.get_many")
+    def test_resolve_without_candidates(self, mock_get_many):
+        self.assertEqual(self.resolver.resolve([]), ([], []))
+        mock_get_many.assert_not_called()
+
+
+class PreferencesResolverTestCase(TestCase):
+    def setUp(self) -> None:
+        self.resolver = PreferencesResolver(maxsize=16, ttl=60)
+        self.document = {
+            "user_id": 1,
+            "notification_types": [{"name": "profile_update"}],
+            "ws_enabled": True,
+            "email_enabled": False,
+        }
+
+    @patch("communications.preferences.NotificationPreferences.objects")
+    def test_preferences_are_loaded_once(self, mock_objects):
+        mock_objects.return_value.only.return_value.as_pymongo.return_value = [self.document]
+
+        preferences = self.resolver.get_many([1, 2])
+        self.assertEqual(self.resolver.get_many([1, 2]), preferences)
+
+        mock_objects.assert_called_once()
+        self.assertEqual(set(mock_objects.call_args.kwargs["user_id__in"]), {1, 2})
+        self.assertEqual(list(preferences), [1])
+        self.assertTrue(preferences[1].has(NotificationTypeEnum.PROFILE_UPDATE))
+        self.assertFalse(preferences[1].email_enabled(NotificationTypeEnum.PROFILE_UPDATE))
+
+    @patch("communications.preferences.NotificationPreferences.objects")
+    def test_documents_of_user_are_merged(self, mock_objects):
+        mock_objects.return_value.only.return_value.as_pymongo.return_value = [
+            self.document,
+            {
+                "user_id": 1,
+                "notification_types": [{"name": "new_message"}],
+                "ws_enabled": False,
+                "email_enabled": True,
+            },
+        ]
+
+        preferences = self.resolver.get(1)
+
+        # flags of a document apply only to the types it lists
+        self.assertEqual(
+            preferences.channels,
+            {"profile_update": (True, False), "new_message": (False, True)}
+        )
+        self.assertFalse(preferences.email_enabled(NotificationTypeEnum.PROFILE_UPDATE))
+        self.assertFalse(preferences.ws_enabled(NotificationTypeEnum.NEW_MESSAGE))
+
+    @patch("communications.preferences.NotificationPreferences.objects")
+    def test_invalidated_user_is_reloaded(self, mock_objects):
+        mock_objects.return_value.only.return_value.as_pymongo.return_value = [self.document]
+
+        self.resolver.get(1)
+        self.resolver.invalidate(1)
+        self.resolver.get(1)
+
+        self.assertEqual(mock_objects.call_count, 2)
+
+
+class RoomCacheTestCase(TestCase):
+    def setUp(self) -> None:
+        room_cache.clear()
+        self.room_id = ObjectId()
+        self.room = Room(id=self.room_id, name="room")
+
+    def tearDown(self) -> None:
+        room_cache.clear()
+
+    @patch("communications.cache.Room.objects")
+    def test_room_is_fetched_once(self, mock_objects):
+        mock_objects.return_value.first.return_value = self.room
+        request = SimpleNamespace()
+
+        self.assertIs(get_room(self.room_id, request), self.room)
+        self.assertIs(get_room(str(self.room_id), request), self.room)
+        self.assertIs(get_room(self.room_id), self.room)
+
+        mock_objects.assert_called_once_with(id=self.room_id)
+
+    @patch("communications.cache.Room.objects")
+    def test_missing_room_is_not_cached_between_requests(self, mock_objects):
+        mock_objects.return_value.first.return_value = None
+
+        self.assertIsNone(get_room(self.room_id, SimpleNamespace()))
+        self.assertIsNone(get_room(self.room_id, SimpleNamespace()))
+
+        self.assertEqual(mock_objects.call_count, 2)
+
+
+class NamespaceOwnershipCacheTestCase(TestCase):
+    def setUp(self) -> None:
+        namespace_ownership_cache.clear()
+        self.namespace_info = {"user_id": 1, "namespace": "startup", "namespace_id": "5"}
+
+    def tearDown(self) -> None:
+        namespace_ownership_cache.clear()
+
+    @patch("communications.helpers.Startup.objects")
+    def test_ownership_is_verified_once(self, mock_objects):
+        mock_objects.filter.return_value.exists.return_value = True
+
+        self.assertTrue(is_namespace_info_correct(self.namespace_info))
+        self.assertTrue(is_namespace_info_correct(self.namespace_info))
+
+        mock_objects.filter.assert_called_once_with(user__user_id=1, startup_id=5)
+
+    @patch("communications.helpers.Startup.objects")
+    def test_requester_token_claims_skip_database(self, mock_objects):
+        token_payload = {"user_id": 1, "name_space_name": "startup", "name_space_id": 5}
+
+        self.assertTrue(is_namespace_info_correct(self.namespace_info, token_payload))
+
+        mock_objects.filter.assert_not_called()
+
+
+class NotificationFanOutTestCase(TestCase):
+    def setUp(self) -> None:
+        self.builder = NotificationBuilder()
+        self.builder.ws_message = {"type": "notify_user", "message": "hello"}
+
+    @patch("communications.utils.get_channel_layer")
+    def test_send_many_reports_failed_groups(self, mock_get_channel_layer):
+        error = ConnectionError("redis is down")
+
+        async def group_send(room_name, message):
+            if room_name == "notifications_2":
+                raise error
+
+        channel_layer = mock_get_channel_layer.return_value
+        channel_layer.group_send = AsyncMock(side_effect=group_send)
+
+        failures = async_to_sync(self.builder.send_many)(
+            ["notifications_1", "notifications_2", "notifications_3"]
+        )
+
+        self.assertEqual(failures, {"notifications_2": error})
+        self.assertEqual(channel_layer.group_send.await_count, 3)
+
+
+class DispatchNotificationTestCase(TestCase):
+    @override_settings(NOTIFICATION_DISPATCH_ASYNC=True)
+    @patch("communications.tasks.dispatch_notification_task")
+    def test_notification_is_dispatched_to_worker(self, mock_task):
+        dispatch_notification(
+            StartupChatNotificationManager,
+            5,
+            "hello",
+            room_id="room",
+            message_id="message"
+        )
+
+        mock_task.delay.assert_called_once_with(
+            manager="StartupChatNotificationManager",
+            initiator_id=5,
+            message="hello",
+            room_id="room",
+            message_id="message"
+        )
+        mock_task.assert_not_called()
+
+    @override_settings(NOTIFICATION_DISPATCH_ASYNC=False)
+    @patch("communications.tasks.dispatch_notification_task")
+    def test_notification_is_dispatched_in_process(self, mock_task):
+        dispatch_notification(StartupChatNotificationManager, 5, "hello")
+
+        mock_task.assert_called_once()
+        mock_task.delay.assert_not_called()
+
+    @override_settings(NOTIFICATION_DISPATCH_ASYNC=True)
+    @patch("communications.tasks.dispatch_notification_task")
+    def test_notification_is_dispatched_in_process_without_broker(self, mock_task):
+        mock_task.delay.side_effect = OperationalError("connection refused")
+
+        dispatch_notification(StartupChatNotificationManager, 5, "hello")
+
+        mock_task.assert_called_once_with(
+            manager="StartupChatNotificationManager",
+            initiator_id=5,
+            message="hello",
+            room_id=None
+        )
+
+
+class NotificationCoalescerTestCase(TestCase):
+    def setUp(self) -> None:
+        initiator = NamespaceInfo(user_id=1, namespace=NamespaceEnum.STARTUP, namespace_id=5)
+        self.receivers = [
+            NamespaceInfo(user_id=2, namespace=NamespaceEnum.INVESTOR, namespace_id=20),
+            NamespaceInfo(user_id=3, namespace=NamespaceEnum.INVESTOR, namespace_id=30),
+        ]
+        self.coalescer = NotificationCoalescer(
+            initiator,
+            NotificationTypeEnum.PROFILE_UPDATE,
+            backend=LocalCoalescingBackend(window=60)
+        )
+
+    @patch("communications.coalescing.NotificationInbox._get_collection")
+    def test_burst_is_merged_into_pending_notification(self, mock_get_collection):
+        inbox = mock_get_collection.return_value
+        first_id, second_id, third_id = ObjectId(), ObjectId(), ObjectId()
+
+        self.assertEqual(self.coalescer.coalesce(first_id, self.receivers), self.receivers)
+        inbox.find.assert_not_called()
+
+        # receiver 3 has already acknowledged the first notification
+        inbox.find.return_value = [{"user_id": 2}]
+        fresh = self.coalescer.coalesce(second_id, self.receivers)
+
+        self.assertEqual(fresh, [self.receivers[1]])
+        inbox.update_many.assert_called_once_with(
+            {"notification": first_id, "user_id": {"$in": [2]}},
+            {"$inc": {"count": 1}}
+        )
+
+        inbox.find.return_value = []
+        self.coalescer.coalesce(third_id, self.receivers[1:])
+        self.assertEqual(inbox.find.call_args.args[0]["notification"], second_id)
+
+
+class CompiledSchemaTestCase(TestCase):
+    MESSAGES = [
+        {"type": "notification_ack", "notification_id": " 66a21e4e4b1c2d0a8c7e9f10 ", "extra": 1},
+        {"type": "notification_ack", "notification_id": 15},
+        {"type": "notification_ack", "notification_id": ""},
+        {"type": "notification_ack", "notification_id": None},
+        {"type": "notification_ack", "notification_id": True},
+        {"type": "notification_ack"},
+        {"type": "notification_bulk_ack", "notification_ids": ["a", "b"]},
+        {"type": "notification_bulk_ack", "notification_ids": []},
+        {"type": "notification_bulk_ack", "notification_ids": "ab"},
+        {"type": "notification_bulk_ack", "notification_ids": ["a"] * 101},
+        {"type": "notify_user", "notification_id": "1", "message": "hi",
+         "initiator": {"user_id": 1}, "created_at": "2024-07-25"},
+        {"type": "notify_user", "notification_id": "1", "message": "hi",
+         "initiator": [], "created_at": "2024-07-25"},
+        {"type": "server_error", "message": "a\x00b"},
+        {"type": "server_error", "message": "a\ud83db"},
+    ]
+
+    def test_message_types_are_compiled(self):
+        for message_type in AutoSerializer.MESSAGE_TYPES:
+            with self.subTest(message_type=message_type):
+                self.assertIsNotNone(AutoSerializer.SCHEMAS[message_type])
+
+    def test_compiled_schemas_match_serializers(self):
+        for message in self.MESSAGES:
+            with self.subTest(message=message):
+                serializer = AutoSerializer.MESSAGE_TYPES[message["type"]](data=message)
+                schema = AutoSerializer.SCHEMAS[message["type"]]
+                self.assertIsNotNone(schema)
+
+                if serializer.is_valid():
+                    self.assertEqual(schema.validate(message), dict(serializer.validated_data))
+                else:
+                    with self.assertRaises(SchemaError):
+                        schema.validate(message)
+
+
+class EncodersTestCase(TestCase):
+    def test_mongo_values_are_encoded(self):
+        notification_id = ObjectId()
+        content = {
+            "notification_id": notification_id,
+            "namespace": NamespaceEnum.STARTUP,
+            "message": "привіт",
+        }
+
+        self.assertEqual(
+            encoders.loads(encoders.dumps(content)),
+            {"notification_id": str(notification_id), "namespace": "startup", "message": "привіт"}
+        )
+        self.assertEqual(encoders.loads(encoders.dumps_str(content)), encoders.loads(encoders.dumps(content)))
+
+    def test_datetimes_are_encoded_like_drf(self):
+        content = {"created_at": datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)}
+
+        self.assertEqual(encoders.dumps(content), JSONRenderer().render(content))
+
+
+class FastJSONRendererTestCase(TestCase):
+    def test_line_separators_are_escaped(self):
+        content = {"message": "line\u2028paragraph\u2029end"}
+
+        self.assertEqual(FastJSONRenderer().render(content), JSONRenderer().render(content))
+
+    def test_indented_response_is_rendered_by_drf(self):
+        content = {"message": "привіт"}
+
+        self.assertEqual(
+            FastJSONRenderer().render(content, "application/json; indent=2"),
+            JSONRenderer().render(content, "application/json; indent=2")
+        )
+
+    @patch.object(FastJSONRenderer, "compact", False)
+    def test_non_compact_response_is_rendered_by_drf(self):
+        self.assertEqual(FastJSONRenderer().render({"id": 1}), b'{"id": 1}')
+
+
+class ChatConsumerAuthorTestCase(TestCase):
+    def setUp(self) -> None:
+        self.investor = NamespaceInfo(user_id=1, namespace=NamespaceEnum.INVESTOR, namespace_id=10)
+        self.startup = NamespaceInfo(user_id=2, namespace=NamespaceEnum.STARTUP, namespace_id=20)
+        self.room = Room(id=ObjectId(), name="room", participants=[self.investor, self.startup])
+        self.consumer = ChatConsumer()
+
+    def test_participant_is_author(self):
+        self.consumer.token_payload = {"user_id": 2, "name_space_name": "startup", "name_space_id": 20}
+
+        self.assertEqual(
+            self.consumer._get_author(self.room),
+            {"user_id": 2, "namespace": "startup", "namespace_id": 20}
+        )
+
+    def test_other_namespace_of_participant_is_rejected(self):
+        self.consumer.token_payload = {"user_id": 2, "name_space_name": "investor", "name_space_id": 20}
+
+        self.assertIsNone(self.consumer._get_author(self.room))
+        self.assertIsNone(self.consumer._get_author(None))
+
+
+class NotificationBackfillTestCase(TestCase):
+    @override_settings(NOTIFICATION_BACKFILL_BATCH_SIZE=2, NOTIFICATION_BACKFILL_LIMIT=10)
+    @patch("communications.consumers.NotificationService.get_since")
+    def test_backfill_continues_after_page_without_payloads(self, mock_get_since):
+        since, last_row = ObjectId(), ObjectId()
+        last_created_at = datetime(2024, 7, 25, 12, 0)
+        document = {
+            "_id": ObjectId(),
+            "initiator": {"user_id": 2, "namespace": "startup", "namespace_id": 3},
+            "message": "missed",
+            "created_at": last_created_at,
+        }
+        # payloads of the first page were removed meanwhile
+        mock_get_since.side_effect = [([], (last_created_at, last_row)), ([document], None)]
+
+        consumer = NotificationConsumer()
+        consumer.user_id = 1
+        consumer._verify_and_send = AsyncMock()
+
+        async_to_sync(consumer._backfill)(since)
+
+        self.assertEqual(
+            [call.kwargs for call in mock_get_since.call_args_list],
+            [
+                {"since": since, "limit": 2, "since_created_at": None},
+                {"since": last_row, "limit": 2, "since_created_at": last_created_at},
+            ]
+        )
+        consumer._verify_and_send.assert_awaited_once()
+
+
+class ChatBroadcastTestCase(TestCase):
+    def setUp(self) -> None:
+        self.investor = NamespaceInfo(user_id=1, namespace=NamespaceEnum.INVESTOR, namespace_id=10)
+        self.startup = NamespaceInfo(user_id=2, namespace=NamespaceEnum.STARTUP, namespace_id=20)
+        self.room = Room(id=ObjectId(), name="room", participants=[self.investor, self.startup])
+
+    @patch("communications.services.dispatch_notification")
+    @patch("communications.utils.get_channel_layer")
+    @patch.object(Room, "register_message")
+    @patch.object(Message, "save")
+    def test_message_is_broadcast_to_room_once(
+        self, mock_save, mock_register, mock_get_channel_layer, mock_dispatch
+    ):
+        channel_layer = mock_get_channel_layer.return_value
+        channel_layer.group_send = AsyncMock()
+
+        message = ChatService.send_message(
+            self.room,
+            {"author": {"user_id": 1, "namespace": "investor", "namespace_id": 10}, "content": "hi"}
+        )
+
+        channel_layer.group_send.assert_awaited_once()
+        group_name, event = channel_layer.group_send.await_args.args
+        self.assertEqual(group_name, f"room_{self.room.pk}")
+        self.assertEqual(event["type"], "chat_message")
+        self.assertEqual(event["message_id"], str(message.pk))
+        mock_dispatch.assert_called_once()
+
+    @patch("communications.services.dispatch_notification")
+    @patch("communications.utils.get_channel_layer")
+    @patch.object(Room, "register_message")
+    @patch.object(Message, "save")
+    def test_notification_is_dispatched_when_broadcast_fails(
+        self, mock_save, mock_register, mock_get_channel_layer, mock_dispatch
+    ):
+        mock_get_channel_layer.return_value.group_send = AsyncMock(
+            side_effect=ConnectionError("redis is down")
+        )
+
+        ChatService.send_message(
+            self.room,
+            {"author": {"user_id": 1, "namespace": "investor", "namespace_id": 10}, "content": "hi"}
+        )
+
+        mock_save.assert_called_once()
+        mock_dispatch.assert_called_once()
+
+
+class GroupOverflowFilterTestCase(TestCase):
+    def setUp(self) -> None:
+        channel_layer_metrics.reset()
+
+    def tearDown(self) -> None:
+        channel_layer_metrics.reset()
+
+    def test_group_overflow_is_counted(self):
+        record = logging.LogRecord(
+            "channels_redis.core", logging.INFO, __file__, 1,
+            "%s of %s channels over capacity in group %s", (2, 3, "notifications_1"), None
+        )
+
+        self.assertTrue(GroupOverflowFilter().filter(record))
+        self.assertEqual(
+            channel_layer_metrics.snapshot(),
+            {"group_overflow": 1, "group_overflow_channels": 2}
+        )
+
+
+class WebsocketLimitersTestCase(TestCase):
+    def setUp(self) -> None:
+        websocket_limiter_metrics.reset()
+
+    def tearDown(self) -> None:
+        websocket_limiter_metrics.reset()
+
+    def test_token_bucket_rejects_when_empty(self):
+        bucket = TokenBucket(rate=0, capacity=3)
+
+        self.assertTrue(bucket.consume(2))
+        self.assertFalse(bucket.consume(2))
+        self.assertTrue(bucket.consume())
+        self.assertFalse(bucket.consume())
+
+    def test_outbound_overflow_replaces_pending_frames(self):
+        overflow_frame = {"type": "notifications_overflow", "message": "overflow"}
+        outbound = OutboundQueue(2, overflow_frame)
+
+        self.assertTrue(outbound.offer({"type": "notify_user", "n": 1}))
+        self.assertTrue(outbound.offer({"type": "notify_user", "n": 2}))
+        self.assertFalse(outbound.offer({"type": "notify_user", "n": 3}))
+        # dropped until the client receives the overflow frame
+        self.assertFalse(outbound.offer({"type": "notify_user", "n": 4}))
+
+        self.assertTrue(outbound.degraded)
+        self.assertEqual(outbound.overflows, 1)
+        self.assertIs(async_to_sync(outbound.get)(), overflow_frame)
+        self.assertFalse(outbound.degraded)
+        self.assertTrue(outbound.offer({"type": "notify_user", "n": 5}))
+        self.assertEqual(
+            websocket_limiter_metrics.snapshot(),
+            {"outbound_dropped": 4, "outbound_overflows": 1}
+        )
+
+
+
+class NotificationConsumerRateLimitTestCase(TestCase):
+    def setUp(self) -> None:
+        self.consumer = NotificationConsumer()
+        self.consumer.user_id = 1
+        self.consumer.room_group_name = "notifications_1"
+        self.consumer.frame_limiter = TokenBucket(rate=0, capacity=10)
+        self.consumer.rate_limit_strikes = 0
+        self.consumer.close = AsyncMock()
+        self.consumer._update_room_subscription = AsyncMock()
+        websocket_limiter_metrics.reset()
+
+    def tearDown(self) -> None:
+        websocket_limiter_metrics.reset()
+
+    @override_settings(WS_RATE_LIMIT_STRIKES=3)
+    def test_room_subscriptions_are_limited_before_validation(self):
+        for _ in range(13):
+            async_to_sync(self.consumer.receive_json)({"type": "room_join", "room": str(ObjectId())})
+
+        self.assertEqual(self.consumer._update_room_subscription.await_count, 10)
+        self.consumer.close.assert_awaited_once_with(code=4029)
+        self.assertEqual(
+            websocket_limiter_metrics.snapshot(),
+            {"rate_limited_frames": 3, "rate_limited_closed": 1}
+        )
+
+    def test_bulk_ack_larger_than_bucket_passes(self):
+        content = {"type": "notification_bulk_ack", "notification_ids": [str(ObjectId())] * 100}
+
+        self.assertFalse(self.consumer._is_rate_limited(content))
+        self.assertTrue(self.consumer._is_rate_limited(content))
+
+class ConversationsPaginationTestCase(UserSetupMixin):
+    NAMESPACE_ID = 10
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        token = AccessToken.for_user(self.test_user)
+        token["name_space_id"] = self.NAMESPACE_ID
+        token["name_space_name"] = NamespaceEnum.INVESTOR.value
+        self.client.cookies["access_token"] = str(token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        self.investor = NamespaceInfo(
+            user_id=self.test_user.user_id,
+            namespace=NamespaceEnum.INVESTOR,
+            namespace_id=self.NAMESPACE_ID
+        )
+        self.activity_at = datetime(2024, 7, 25, 12, 0)
+        # the last two rooms share the activity time, the id orders them
+        self.rooms = [
+            self.create_room(index, self.activity_at + timedelta(seconds=min(index, 2)))
+            for index in range(4)
+        ]
+        self.foreign_room = Room(
+            name=f"foreign_{ObjectId()}",
+            participants=[
+                NamespaceInfo(user_id=0, namespace=NamespaceEnum.INVESTOR, namespace_id=11),
+                NamespaceInfo(user_id=0, namespace=NamespaceEnum.STARTUP, namespace_id=20)
+            ],
+            last_activity_at=self.activity_at
+        ).save()
+
+    def create_room(self, index: int, last_activity_at: datetime) -> Room:
+        return Room(
+            name=f"room {index} {ObjectId()}",
+            participants=[
+                self.investor,
+                NamespaceInfo(user_id=0, namespace=NamespaceEnum.STARTUP, namespace_id=20 + index)
+            ],
+            last_activity_at=last_activity_at
+        ).save()
+
+    def tearDown(self) -> None:
+        room_ids = [room.pk for room in self.rooms + [self.foreign_room]]
+        Message.objects(room__in=room_ids).delete()
+        Room.objects(pk__in=room_ids).delete()
+        room_cache.clear()
+        super().tearDown()
+
+    def get_page(self, **params):
+        response = self.client.get(reverse("conversations_list"), params)
+        if response.status_code != status.HTTP_200_OK:
+            return response, None
+
+        return response, [json.loads(room) for room in json.loads(response.json())]
+
+    def get_names(self, **params) -> list[str]:
+        _, rooms = self.get_page(**params)
+        return [room["name"] for room in rooms]
+
+    def test_rooms_of_namespace_most_recently_active_first(self):
+        self.assertEqual(
+            self.get_names(limit=10),
+            [room.name for room in reversed(self.rooms)]
+        )
+
+    def test_pages_follow_cursor(self):
+        self.assertEqual(self.get_names(limit=2), [self.rooms[3].name, self.rooms[2].name])
+        self.assertEqual(
+            self.get_names(limit=2, before=str(self.rooms[2].pk)),
+            [self.rooms[1].name, self.rooms[0].name]
+        )
+
+    def test_invalid_params_are_rejected(self):
+        for params in (
+            {"limit": "many"},
+            {"before": "invalid"},
+            {"before": str(self.foreign_room.pk)},
+        ):
+            with self.subTest(params=params):
+                response, _ = self.get_page(**params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_room_activity_is_backfilled(self):
+        # room stored before `last_activity_at` was added
+        room_id = Room._get_collection().insert_one({
+            "name": f"legacy {ObjectId()}",
+            "participants": [
+                self.investor.to_mongo(),
+                {"user_id": 0, "namespace": "startup", "namespace_id": 30},
+            ],
+            "created_at": self.activity_at,
+            "unread_counters": {},
+        }).inserted_id
+        self.rooms.append(Room.objects.get(pk=room_id))
+        Message(
+            room=self.rooms[-1],
+            author=self.investor,
+            content="latest",
+            created_at=self.activity_at + timedelta(seconds=3)
+        ).save()
+
+        response, _ = self.get_page(before=str(room_id))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        backfill_room_activity(batch_size=1)
+
+        self.assertEqual(self.get_names(limit=1), [self.rooms[-1].name])
+        self.assertEqual(self.get_names(limit=1, before=str(room_id)), [self.rooms[3].name])
+
+    def test_unread_counters_follow_messages(self):
+        room = self.rooms[0]
+        startup = room.participants[1]
+        message = Message(room=room, author=startup, content="hello").save()
+        room.register_message(message)
+
+        _, rooms = self.get_page(limit=1)
+        self.assertEqual(rooms[0]["name"], room.name)
+        self.assertEqual(rooms[0]["last_message"]["content"], "hello")
+        self.assertEqual(rooms[0]["unread_counters"], {f"investor_{self.NAMESPACE_ID}": 1})
+
+        response = self.client.post(
+            reverse("read_conversation", kwargs={"conversation_id": str(room.pk)})
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            Room.objects.get(pk=room.pk).unread_counters,
+            {f"investor_{self.NAMESPACE_ID}": 0}
+        )
+
+
+class MessagesPaginationTestCase(UserSetupMixin):
+    NAMESPACE_ID = 10
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        token = AccessToken.for_user(self.test_user)
+        token["name_space_id"] = self.NAMESPACE_ID
+        token["name_space_name"] = NamespaceEnum.INVESTOR.value
+        self.client.cookies["access_token"] = str(token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        author = NamespaceInfo(
+            user_id=self.test_user.user_id,
+            namespace=NamespaceEnum.INVESTOR,
+            namespace_id=self.NAMESPACE_ID
+        )
+        self.room = Room(
+            name=f"pagination_{ObjectId()}",
+            participants=[
+                author,
+                NamespaceInfo(user_id=0, namespace=NamespaceEnum.STARTUP, namespace_id=20)
+            ]
+        )
+        self.room.save()
+
+        created_at = datetime(2024, 7, 25, 12, 0)
+        # the last two messages share the time, the id orders them
+        self.messages = [
+            Message(
+                room=self.room,
+                author=author,
+                content=f"message {index}",
+                created_at=created_at + timedelta(seconds=min(index, 3))
+            ).save()
+            for index in range(5)
+        ]
+
+    def tearDown(self) -> None:
+        self.room.delete()
+        room_cache.clear()
+        super().tearDown()
+
+    def get_page(self, **params):
+        response = self.client.get(
+            reverse("conversation_messages", kwargs={"conversation_id": str(self.room.pk)}),
+            params
+        )
+        if response.status_code != status.HTTP_200_OK:
+            return response, None
+
+        return response, [message["content"] for message in json.loads(response.json())]
+
+    def test_latest_page_in_chronological_order(self):
+        response, contents = self.get_page(limit=2)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(contents, ["message 3", "message 4"])
+
+    def test_pages_before_and_after_cursor(self):
+        _, before = self.get_page(limit=2, before=str(self.messages[3].pk))
+        _, after = self.get_page(limit=2, after=str(self.messages[3].pk))
+
+        self.assertEqual(before, ["message 1", "message 2"])
+        self.assertEqual(after, ["message 4"])
+
+    def test_limit_is_clamped(self):
+        _, contents = self.get_page(limit=0)
+        self.assertEqual(contents, ["message 4"])
+
+        _, contents = self.get_page(limit=10_000)
+        self.assertEqual(len(contents), len(self.messages))
+
+    def test_invalid_params_are_rejected(self):
+        for params in (
+            {"limit": "many"},
+            {"before": "invalid"},
+            {"before": str(ObjectId())},
+            {"before": str(self.messages[0].pk), "after": str(self.messages[1].pk)},
+        ):
+            with self.subTest(params=params):
+                response, _ = self.get_page(**params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_messages_index_matches_page_order(self):
+        self.assertIn(
+            [("room", 1), ("created_at", 1), ("_id", 1)],
+            Message.list_indexes()
+        )
+
+
+class MetricsExportTestCase(TestCase):
+    def setUp(self) -> None:
+        self.exporter = MagicMock()
+        self.counters = metrics.Counters("test")
+
+    @override_settings(METRICS_FLUSH_INTERVAL=0)
+    @patch("forum.metrics.get_exporter")
+    def test_increments_are_exported_once(self, mock_get_exporter):
+        mock_get_exporter.return_value = self.exporter
+
+        self.counters.increment("dropped", 2)
+        self.counters.increment("dropped")
+
+        self.assertEqual(
+            self.exporter.flush.call_args_list,
+            [call("test", {"dropped": 2}), call("test", {"dropped": 1})]
+        )
+        self.assertEqual(self.counters.snapshot(), {"dropped": 3})
+
+    @override_settings(METRICS_FLUSH_INTERVAL=0)
+    @patch("forum.metrics.get_exporter")
+    def test_failed_export_is_retried(self, mock_get_exporter):
+        mock_get_exporter.return_value = self.exporter
+        self.exporter.flush.side_effect = [redis.ConnectionError(), None]
+
+        self.counters.increment("dropped")
+        self.counters.increment("dropped")
+
+        self.assertEqual(self.exporter.flush.call_args_list[-1], call("test", {"dropped": 2}))
+
+    @patch("forum.metrics.get_exporter")
+    def test_snapshot_is_read_from_exporter(self, mock_get_exporter):
+        mock_get_exporter.return_value = self.exporter
+        self.exporter.read.return_value = {"channel_layer": {"group_overflow": 5}}
+
+        self.assertEqual(metrics.snapshot(), {"channel_layer": {"group_overflow": 5}})
+
@@ -7,5 +7,7 @@ urlpatterns = [
     path("conversations/", views.ConversationsListView.as_view(), name="conversations_list"),
     path("messages/send", views.SendMessageView.as_view(), name="send_message"),
     path("conversations/<str:conversation_id>/messages", views.MessagesListView.as_view(), name="conversation_messages"),
+    path("conversations/<str:conversation_id>/read", views.ReadConversationView.as_view(), name="read_conversation"),
     path("messages/<str:message_id>", views.MessageDetailView.as_view(), name="message"),
+    path("metrics", views.CommunicationMetricsView.as_view(), name="communication_metrics"),
 ]
@@ -1,8 +1,11 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, Iterable
 
 from asgiref.sync import async_to_sync
+from bson.objectid import ObjectId
 from channels.layers import get_channel_layer
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from investors.models import Investor
 from projects.models import Project, ProjectSubscription
@@ -12,22 +15,30 @@ from users.models import CustomUser
 
 from forum.logging import logger
 from forum.settings import EMAIL_HOST_USER
-from forum.tasks import send_email_task
+from forum.tasks import send_bulk_email_task
 from forum.utils import build_email_message
 
+from .coalescing import NotificationCoalescer
 from .exceptions import BaseNotificationException, InvalidDataError, MessageTypeError
 from .mongo_models import (
+    Message,
     NamespaceEnum,
     NamespaceInfo,
     Notification,
-    NotificationPreferences,
+    NotificationInbox,
     NotificationTypeEnum,
 )
+from .preferences import preferences_resolver
+from .schemas import CompiledSchema, SchemaError, compile_schema
 from .serializers import (
     WSChatMessageSerializer,
+    WSChatRoomMessageSerializer,
+    WSChatSendSerializer,
     WSClientMessageSerializer,
     WSNotificationAckSerializer,
+    WSNotificationBulkAckSerializer,
     WSNotificationSerializer,
+    WSRoomSubscriptionSerializer,
     WSServerMessageSerializer,
 )
 
@@ -43,10 +54,42 @@ class BaseWSMessageBuilder(ABC):
     async def send(self, room_name: str):
         channel_layer = get_channel_layer()
 
+        # delivery is best effort, callers have persisted their data by now
         try:
             await channel_layer.group_send(room_name, self.ws_message)
-        except ValueError as exc:
-            logger.error(exc)
+        except Exception as exc:
+            logger.error(f"Failed to send '{self.ws_message['type']}' to {room_name}: {exc!r}")
+
+    async def send_many(self, room_names: Iterable[str]) -> dict[str, Exception]:
+        """
+            Send the message to many groups concurrently within one event loop.
+            At most NOTIFICATION_FANOUT_CONCURRENCY group sends are in flight at once.
+
+        Returns:
+            dict[str, Exception]: groups the message was not delivered to with the reason
+        """
+        channel_layer = get_channel_layer()
+        semaphore = asyncio.Semaphore(settings.NOTIFICATION_FANOUT_CONCURRENCY)
+
+        async def send(room_name: str) -> None:
+            async with semaphore:
+                await channel_layer.group_send(room_name, self.ws_message)
+
+        room_names = list(room_names)
+        results = await asyncio.gather(
+            *(send(room_name) for room_name in room_names),
+            return_exceptions=True
+        )
+
+        failures = {
+            room_name: result
+            for room_name, result in zip(room_names, results)
+            if isinstance(result, Exception)
+        }
+        for room_name, exc in failures.items():
+            logger.error(f"Failed to send '{self.ws_message['type']}' to {room_name}: {exc!r}")
+
+        return failures
 
 
 class NotificationBuilder(BaseWSMessageBuilder):
@@ -59,6 +102,18 @@ class NotificationBuilder(BaseWSMessageBuilder):
             "created_at": str(notification.created_at)
         }
 
+    def build_from_document(self, document: dict) -> None:
+        """
+            Build the message from a raw notification document (see NotificationService).
+        """
+        self.ws_message = {
+            "type": "notify_user",
+            "notification_id": str(document["_id"]),
+            "initiator": document["initiator"],
+            "message": document["message"],
+            "created_at": str(document["created_at"])
+        }
+
 
 class ChatNotificationBuilder(NotificationBuilder):
     def build(self, notification: Notification, *args, **kwargs) -> None:
@@ -73,6 +128,18 @@ class ChatNotificationBuilder(NotificationBuilder):
         self.ws_message["message_id"] = kwargs["message_id"]
 
 
+class ChatMessageBuilder(BaseWSMessageBuilder):
+    def build(self, message: Message) -> None:
+        self.ws_message = {
+            "type": "chat_message",
+            "message_id": str(message.pk),
+            "room": str(message.room.pk),
+            "author": message.author.to_mongo().to_dict(),
+            "content": message.content,
+            "created_at": str(message.created_at)
+        }
+
+
 class ServerErrorBuilder(BaseWSMessageBuilder):
     def build(self, message: str) -> None:
         self.ws_message = {
@@ -97,16 +164,38 @@ class AutoSerializer:
         # for notifications
         "notify_user": WSNotificationSerializer,
 
+        # message sent by the client to the chat room
+        "chat_send": WSChatSendSerializer,
+
+        # message broadcast to sockets of the chat room
+        "chat_message": WSChatRoomMessageSerializer,
+
+        # subscription of a notifications socket to chat room events
+        "room_join": WSRoomSubscriptionSerializer,
+        "room_leave": WSRoomSubscriptionSerializer,
+
         # for notification acknowledge
         "notification_ack": WSNotificationAckSerializer,
 
+        # for acknowledge of many notifications at once
+        "notification_bulk_ack": WSNotificationBulkAckSerializer,
+
         # server side error (connection will be closed)
         "server_error": WSServerMessageSerializer,
 
+        # notifications were dropped for a slow client, it should fetch them via REST
+        "notifications_overflow": WSServerMessageSerializer,
+
         # client side error (connection will be closed)
         "client_error": WSClientMessageSerializer
     }
 
+    # compiled once, serializers which can not be compiled are applied as is
+    SCHEMAS: dict[str, CompiledSchema | None] = {
+        message_type: compile_schema(serializer_class)
+        for message_type, serializer_class in MESSAGE_TYPES.items()
+    }
+
     def __init__(self, raw_message: dict, room_name: str) -> None:
         self.raw_message = raw_message
         self.room_name = room_name
@@ -141,6 +230,14 @@ class AutoSerializer:
         """
 
         serializer_class: Serializer = await self._get_serializer()
+
+        schema = self.SCHEMAS.get(self.raw_message["type"])
+        if schema is not None:
+            try:
+                return schema.validate(self.raw_message)
+            except SchemaError:
+                raise InvalidDataError()
+
         serializer: Serializer = serializer_class(data=self.raw_message)
         if not serializer.is_valid():
             raise InvalidDataError()
@@ -167,14 +264,70 @@ class AutoSerializer:
             await server_error_builder.send(self.room_name)
 
 
+class ReceiversResolver:
+    """
+        Resolve notification receivers with a constant number of queries.
+
+        Candidates are pairs of already loaded users (e.g. with `select_related`)
+        and ids of their namespaces. Preferences of candidates missing in the
+        preferences cache are fetched at once.
+    """
+
+    def __init__(
+        self,
+        receivers_namespace: NamespaceEnum,
+        notification_type: NotificationTypeEnum
+    ) -> None:
+        self.receivers_namespace = receivers_namespace
+        self.notification_type = notification_type
+
+    def resolve(
+        self,
+        candidates: Iterable[tuple[CustomUser, int]]
+    ) -> tuple[list[NamespaceInfo], list[CustomUser]]:
+        """
+            Return receivers of the notification and users which should be notified via email.
+        """
+        candidates = list(candidates)
+        if not candidates:
+            return [], []
+
+        preferences = preferences_resolver.get_many(user.user_id for user, _ in candidates)
+
+        receivers: list[NamespaceInfo] = []
+        email_receivers: dict[int, CustomUser] = {}
+
+        for user, namespace_id in candidates:
+            preference = preferences.get(user.user_id)
+            if not preference or not preference.has(self.notification_type):
+                continue
+
+            if preference.email_enabled(self.notification_type):
+                email_receivers.setdefault(user.user_id, user)
+
+            receivers.append(
+                NamespaceInfo(
+                    user_id=user.user_id,
+                    namespace=self.receivers_namespace,
+                    namespace_id=namespace_id
+                )
+            )
+
+        return receivers, list(email_receivers.values())
+
+
 class NotificationManager(ABC):
     NAMESPACE_NAME: str = None
     NAMESPACE_RECEIVERS_NAME: str = None
     NOTIFICATION_BUILDER_CLASS: NotificationBuilder = NotificationBuilder
     NOTIFICATION_TYPE: str = None
+    # merge bursts of notifications to the same receiver, see NotificationCoalescer
+    COALESCE: bool = False
 
     def __init__(self, namespace_obj: Investor | Startup) -> None:
         self.namespace = namespace_obj
+        # filled by receivers resolution, emails are sent once receivers are final
+        self.email_receivers: dict[int, CustomUser] = {}
 
         if not self.NAMESPACE_NAME:
             raise ValueError("Initiator namespace name was not defined")
@@ -196,6 +349,37 @@ class NotificationManager(ABC):
     def _create_receivers_namespaces(self) -> list[NamespaceInfo]:
         ...
 
+    def _resolve_receivers(
+        self,
+        candidates: Iterable[tuple[CustomUser, int]]
+    ) -> list[NamespaceInfo]:
+        resolver = ReceiversResolver(self.NAMESPACE_RECEIVERS_NAME, self.NOTIFICATION_TYPE)
+        receivers, email_receivers = resolver.resolve(candidates)
+
+        self.email_receivers = {user.user_id: user for user in email_receivers}
+
+        return receivers
+
+    def _send_emails(self, users: list[CustomUser]) -> None:
+        if not users:
+            return
+
+        messages = []
+        for user in users:
+            email_context = {
+                'first_name': user.first_name,
+                'notification_type': self.NOTIFICATION_TYPE.value
+            }
+            messages.append({
+                "subject": "Email Notification",
+                "body": build_email_message("email/email_notification.txt",
+                                            email_context),
+                "sender": EMAIL_HOST_USER,
+                "receivers": [user.email]
+            })
+
+        send_bulk_email_task.delay(messages=messages)
+
     @abstractmethod
     def get_namespace_id(self) -> int:
         ...
@@ -214,18 +398,53 @@ class NotificationManager(ABC):
             )
             return
 
+        # one inbox row per user, the websocket group is per user as well
+        receivers_namespaces = list({
+            receiver.user_id: receiver for receiver in receivers_namespaces
+        }.values())
+
         notification = Notification(
+            id=ObjectId(),
             initiator=initiator_namespace,
-            receivers=receivers_namespaces,
             message=message
         )
-        notification.save()
+
+        if self.COALESCE and settings.NOTIFICATION_COALESCE_WINDOW:
+            coalescer = NotificationCoalescer(initiator_namespace, self.NOTIFICATION_TYPE)
+            receivers_namespaces = coalescer.coalesce(notification.pk, receivers_namespaces)
+            if not receivers_namespaces:
+                return
+
+        notification.receivers_count = len(receivers_namespaces)
+        notification.save(force_insert=True)
+
+        NotificationInbox.objects.insert(
+            [
+                NotificationInbox(
+                    notification=notification.pk,
+                    user_id=receiver.user_id,
+                    namespace=receiver.namespace,
+                    namespace_id=receiver.namespace_id,
+                    created_at=notification.created_at
+                )
+                for receiver in receivers_namespaces
+            ],
+            load_bulk=False
+        )
 
         notification_builder = self.NOTIFICATION_BUILDER_CLASS()
         notification_builder.build(notification, **kwargs)
 
-        for receiver in notification.receivers:
-            async_to_sync(notification_builder.send)(f"notifications_{receiver.user_id}")
+        # a single sync-to-async hop for the whole fan-out
+        async_to_sync(notification_builder.send_many)(
+            [f"notifications_{receiver.user_id}" for receiver in receivers_namespaces]
+        )
+
+        self._send_emails([
+            self.email_receivers[receiver.user_id]
+            for receiver in receivers_namespaces
+            if receiver.user_id in self.email_receivers
+        ])
 
 
 class StartupNotificationManager(NotificationManager):
@@ -233,40 +452,18 @@ class StartupNotificationManager(NotificationManager):
     NAMESPACE_RECEIVERS_NAME = NamespaceEnum.INVESTOR
 
     def _create_receivers_namespaces(self) -> list[NamespaceInfo]:
-        receivers: list[NamespaceInfo] = []
-
         project: Project = get_object_or_404(
             Project,
             startup_id=self.namespace.startup_id
         )
-        for i in ProjectSubscription.objects.filter(project=project):
-            user_id = i.investor.user.user_id
-            user: CustomUser = get_object_or_404(CustomUser, user_id=user_id)
-
-            if NotificationPreferences.has_preferences(user_id, self.NOTIFICATION_TYPE):
-                if NotificationPreferences.is_email_enabled(user_id, self.NOTIFICATION_TYPE):
-                    email_context = {
-                        'first_name': user.first_name,
-                        'notification_type': self.NOTIFICATION_TYPE.value
-                    }
-                    email_body = build_email_message("email/email_notification.txt",
-                                                     email_context)
-                    send_email_task.delay(
-                        subject="Email Notification",
-                        body=email_body,
-                        sender=EMAIL_HOST_USER,
-                        receivers=user.email
-                    )
-
-                receivers.append(
-                    NamespaceInfo(
-                        user_id=i.investor.user.user_id,
-                        namespace=self.NAMESPACE_RECEIVERS_NAME,
-                        namespace_id=i.investor.investor_id
-                    )
-                )
+        subscriptions = ProjectSubscription.objects.filter(
+            project=project
+        ).select_related("investor__user")
 
-        return receivers
+        return self._resolve_receivers(
+            (subscription.investor.user, subscription.investor.investor_id)
+            for subscription in subscriptions
+        )
 
     def get_namespace_id(self) -> int:
         return self.namespace.startup_id
@@ -274,6 +471,7 @@ class StartupNotificationManager(NotificationManager):
 
 class ProfileUpdateNotificationManager(StartupNotificationManager):
     NOTIFICATION_TYPE = NotificationTypeEnum.PROFILE_UPDATE
+    COALESCE = True
 
 
 class OtherNotificationManager(StartupNotificationManager):  #template
@@ -285,36 +483,14 @@ class InvestorNotificationManager(NotificationManager):
     NAMESPACE_RECEIVERS_NAME = NamespaceEnum.STARTUP
 
     def _create_receivers_namespaces(self) -> list[NamespaceInfo]:
-        receivers: list[NamespaceInfo] = []
+        subscriptions = ProjectSubscription.objects.filter(
+            investor=self.namespace
+        ).select_related("project__startup__user")
 
-        for i in ProjectSubscription.objects.filter(investor=self.namespace):
-            user_id = i.project.startup.user.user_id
-            user: CustomUser = get_object_or_404(CustomUser, user_id=user_id)
-
-            if NotificationPreferences.has_preferences(user_id, self.NOTIFICATION_TYPE):
-                if NotificationPreferences.is_email_enabled(user_id, self.NOTIFICATION_TYPE):
-                    email_context = {
-                        'first_name': user.first_name,
-                        'notification_type': self.NOTIFICATION_TYPE.value
-                    }
-                    email_body = build_email_message("email/email_notification.txt",
-                                                     email_context)
-                    send_email_task.delay(
-                        subject="Email Notification",
-                        body=email_body,
-                        sender=EMAIL_HOST_USER,
-                        receivers=user.email
-                    )
-
-                receivers.append(
-                    NamespaceInfo(
-                        user_id=i.project.startup.user.user_id,
-                        namespace=self.NAMESPACE_RECEIVERS_NAME,
-                        namespace_id=i.project.startup.startup_id
-                    )
-                )
-
-        return receivers
+        return self._resolve_receivers(
+            (subscription.project.startup.user, subscription.project.startup.startup_id)
+            for subscription in subscriptions
+        )
 
     def get_namespace_id(self) -> int:
         return self.namespace.investor_id
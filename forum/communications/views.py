@@ -1,29 +1,31 @@
 import json
+from bson import json_util
 from bson.errors import InvalidId
 from bson.objectid import ObjectId
 from django.http import JsonResponse
-from django.shortcuts import get_object_or_404
 from django.utils.decorators import method_decorator
 from django_ratelimit.decorators import ratelimit
 from django_ratelimit.exceptions import Ratelimited
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 
 from .mongo_models import Room, Message, NamespaceEnum
 from .serializers import RoomSerializer, ChatMessageSerializer
 from .helpers import generate_room_name
 from .permissions import IsAuthorOfMessage, IsInvestorInitiateChat, \
     IsParticipantOfConversation
-from .utils import InvestorChatNotificationManager, StartupChatNotificationManager
+from users.authentication import ClaimsJWTAuthentication
 from users.permissions import IsNamespace, get_token_payload_from_cookies
-from startups.models import Startup
-from investors.models import Investor
 
+from forum import metrics
 from forum.logging import logger
+from forum.utils import get_page_size
 
-from .helpers import generate_room_name
+from .cache import get_room
+from .helpers import generate_room_name, paginate_messages, paginate_rooms
 from .mongo_models import Message, NamespaceEnum, Room
 from .permissions import (
     IsAuthorOfMessage,
@@ -31,15 +33,23 @@ from .permissions import (
     IsParticipantOfConversation,
 )
 from .serializers import ChatMessageSerializer, RoomSerializer
-from .utils import InvestorChatNotificationManager, StartupChatNotificationManager
+from .services import ChatService
 
 CONVERSATION_BASE_PERMISSIONS = [
     IsAuthenticated,
     IsNamespace
 ]
 
+MESSAGES_PAGE_SIZE = 50
+MESSAGES_MAX_PAGE_SIZE = 200
+
+CONVERSATIONS_PAGE_SIZE = 20
+CONVERSATIONS_MAX_PAGE_SIZE = 100
+
 
 class BaseAPIView(APIView):
+    # conversations rely on token claims only, the user is not loaded
+    authentication_classes = [ClaimsJWTAuthentication]
     permission_classes = CONVERSATION_BASE_PERMISSIONS
 
     def handle_exception(self, exc):
@@ -56,7 +66,7 @@ class CreateConversationView(BaseAPIView):
 
     @method_decorator(ratelimit(key='user_or_ip', rate='15/m', block=True))
     def post(self, request):
-        serializer = RoomSerializer(data=request.data)
+        serializer = RoomSerializer(data=request.data, context={"request": request})
         if serializer.is_valid():
             room_name = generate_room_name(serializer.data["participants"])
             room: Room | None = Room.objects(name=room_name).first()
@@ -78,29 +88,29 @@ class CreateConversationView(BaseAPIView):
 class ConversationsListView(BaseAPIView):
     @method_decorator(ratelimit(key='user_or_ip', rate='15/m', block=True))
     def get(self, request):
+        """
+            Return a page of conversations of the selected namespace, most recently active first.
+            Query param `before` takes conversation id used as a cursor, `limit` sets the page size.
+        """
         token_payload = get_token_payload_from_cookies(request)
         namespace = token_payload.get("name_space_name")
         namespace_id = token_payload.get("name_space_id")
 
-        all_rooms = Room.objects.all()
-        namespace_rooms = [room.to_json() for room in all_rooms if self.is_room_of_namespace(
-            room, namespace, namespace_id
-        )]
-        json_data = json.dumps(namespace_rooms)
+        try:
+            before = request.query_params.get("before")
+            before = ObjectId(before) if before else None
+        except InvalidId:
+            return Response("Invalid cursor", status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = get_page_size(request, CONVERSATIONS_PAGE_SIZE, CONVERSATIONS_MAX_PAGE_SIZE)
+            rooms = paginate_rooms(namespace, namespace_id, limit=limit, before=before)
+        except ValidationError as exc:
+            return Response(exc.detail, status=status.HTTP_400_BAD_REQUEST)
+
+        json_data = json.dumps([json_util.dumps(room) for room in rooms])
 
         return Response(data=json_data, status=status.HTTP_200_OK)
-    
-    @staticmethod
-    def is_room_of_namespace(
-        room: Room,
-        namespace: str,
-        namespace_id: int
-    ) -> bool:
-        return any([
-            (namespace == participant["namespace"].value and 
-                namespace_id == participant["namespace_id"])
-            for participant in room.participants]
-        )
 
 
 class SendMessageView(BaseAPIView):
@@ -111,36 +121,10 @@ class SendMessageView(BaseAPIView):
 
     @method_decorator(ratelimit(key='user_or_ip', rate='15/m', block=True))
     def post(self, request):
-        serializer = ChatMessageSerializer(data=request.data)
+        serializer = ChatMessageSerializer(data=request.data, context={"request": request})
         if serializer.is_valid():
-            new_message = Message(**serializer.data)
-            new_message.save()
-
-            logger.info(f"Message sent: {new_message.id}")
-            # TODO call NotificationManager to send new_message.id
-            if new_message.author.namespace == NamespaceEnum.STARTUP:
-                startup = get_object_or_404(
-                    Startup,
-                    user_id=new_message.author.user_id,
-                    startup_id=new_message.author.namespace_id
-                )
-                manager = StartupChatNotificationManager(startup, new_message.room)
-            elif new_message.author.namespace == NamespaceEnum.INVESTOR:
-                investor = get_object_or_404(
-                    Investor,
-                    user_id=new_message.author.user_id,
-                    investor_id=new_message.author.namespace_id
-                )
-                manager = InvestorChatNotificationManager(investor, new_message.room)
-
-            notification_message = (
-                f'Message: {new_message.id} was sent by {new_message.author.namespace} '
-                f'with id {new_message.author.namespace_id}'
-            )
-            manager.push_notification(
-                notification_message,
-                message_id=str(new_message.pk)
-            )
+            room = get_room(serializer.validated_data["room"], request)
+            new_message = ChatService.send_message(room, serializer.data)
             return Response(new_message.to_json(), status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -152,14 +136,62 @@ class MessagesListView(BaseAPIView):
 
     @method_decorator(ratelimit(key='user_or_ip', rate='15/m', block=True))
     def get(self, request, conversation_id):
+        """
+            Return a page of messages in chronological order.
+            Query params `before` / `after` take message id used as a cursor,
+            `limit` sets the page size.
+        """
         try:
             conversation_id = ObjectId(conversation_id)
         except InvalidId:
             return Response("Invalid room id", status=status.HTTP_400_BAD_REQUEST)
-        # TODO Add here pagination later
-        messages = Message.objects.filter(room = conversation_id).to_json()
+
+        before = request.query_params.get("before")
+        after = request.query_params.get("after")
+        if before and after:
+            return Response(
+                "Only one of 'before' and 'after' can be provided",
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            cursor = ObjectId(before or after) if before or after else None
+        except InvalidId:
+            return Response("Invalid cursor", status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = get_page_size(request, MESSAGES_PAGE_SIZE, MESSAGES_MAX_PAGE_SIZE)
+            messages = paginate_messages(
+                conversation_id,
+                limit=limit,
+                before=cursor if before else None,
+                after=cursor if after else None
+            )
+        except ValidationError as exc:
+            return Response(exc.detail, status=status.HTTP_400_BAD_REQUEST)
+
         logger.info(f"Messages retrieved for conversation: {conversation_id}")
-        return Response(messages, status=status.HTTP_200_OK)
+        return Response(json_util.dumps(messages), status=status.HTTP_200_OK)
+
+
+class ReadConversationView(BaseAPIView):
+    permission_classes = CONVERSATION_BASE_PERMISSIONS + [
+        IsParticipantOfConversation
+    ]
+
+    @method_decorator(ratelimit(key='user_or_ip', rate='15/m', block=True))
+    def post(self, request, conversation_id):
+        """
+            Reset the unread messages counter of the selected namespace.
+        """
+        token_payload = get_token_payload_from_cookies(request)
+
+        Room.reset_unread_counter(
+            ObjectId(conversation_id),
+            token_payload.get("name_space_name"),
+            token_payload.get("name_space_id")
+        )
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class MessageDetailView(APIView):
@@ -173,3 +205,14 @@ class MessageDetailView(APIView):
             return Response("Message doesn't exist.", status=status.HTTP_404_NOT_FOUND)
         return Response(message.to_json(), status=status.HTTP_200_OK)
     
+
+
+class CommunicationMetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """
+            Return monitoring counters, e.g. channel layer overflows, summed over
+            all processes or of this process if METRICS_REDIS_URL is empty.
+        """
+        return Response(metrics.snapshot(), status=status.HTTP_200_OK)
@@ -1,10 +1,14 @@
 from django.urls import path
 
-from .consumers import NotificationConsumer
+from .consumers import ChatConsumer, NotificationConsumer
 
 websocket_urlpatterns = [
     path(
         "ws/notifications/<access_token>",
         NotificationConsumer.as_asgi(), name="notifications"
     ),
+    path(
+        "ws/chat/<room_id>/<access_token>",
+        ChatConsumer.as_asgi(), name="chat"
+    ),
 ]
@@ -20,3 +20,11 @@ def setup_periodic_tasks(sender, **kwargs):
         crontab(minute='*/2'),
         password_reset_ttl_task.s(),
     )
+
+    if settings.NOTIFICATION_ARCHIVE_AFTER_DAYS:
+        from notifications.tasks import archive_notifications_task
+
+        sender.add_periodic_task(
+            crontab(minute=0, hour=3),
+            archive_notifications_task.s(),
+        )
@@ -0,0 +1,65 @@
+"""
+    JSON encoding shared by websocket consumers and DRF responses.
+
+    orjson is used when it is installed (the `fast-json` extra), otherwise the stdlib
+    encoder is used. Both handle ObjectId, datetime and Enum values; datetimes are
+    always formatted by DRF's encoder, so both produce the same output for them.
+"""
+import json
+from enum import Enum
+from typing import Any
+
+from bson.objectid import ObjectId
+from rest_framework.utils.encoders import JSONEncoder as DRFJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class JSONEncoder(DRFJSONEncoder):
+    def default(self, obj: Any) -> Any:
+        if isinstance(obj, ObjectId):
+            return str(obj)
+        if isinstance(obj, Enum):
+            return obj.value
+
+        return super().default(obj)
+
+
+_fallback_encoder = JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def _orjson_default(obj: Any) -> Any:
+        # orjson handles Enum, UUID and dataclasses itself
+        if isinstance(obj, ObjectId):
+            return str(obj)
+
+        return _fallback_encoder.default(obj)
+
+
+def dumps(obj: Any) -> bytes:
+    """
+        Serialize the object to compact UTF-8 encoded JSON.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_orjson_default, option=ORJSON_OPTIONS)
+
+    return _fallback_encoder.encode(obj).encode()
+
+
+def dumps_str(obj: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_orjson_default, option=ORJSON_OPTIONS).decode()
+
+    return _fallback_encoder.encode(obj)
+
+
+def loads(data: str | bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+
+    return json.loads(data)
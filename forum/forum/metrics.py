@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import Counter
+from functools import cache
+
+import redis
+from django.conf import settings
+
+from forum.logging import logger
+
+KEY_PREFIX = "forum_metrics"
+
+
+class RedisExporter:
+    """
+        Sums counters of every process (web, daphne, Celery) in Redis hashes,
+        one hash per Counters name.
+    """
+
+    def __init__(self, url: str) -> None:
+        self.client = redis.Redis.from_url(url)
+
+    def flush(self, name: str, counts: dict[str, int]) -> None:
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.sadd(KEY_PREFIX, name)
+        for key, value in counts.items():
+            pipeline.hincrby(f"{KEY_PREFIX}:{name}", key, value)
+        pipeline.execute()
+
+    def read(self) -> dict[str, dict[str, int]]:
+        names = sorted(name.decode() for name in self.client.smembers(KEY_PREFIX))
+
+        pipeline = self.client.pipeline(transaction=False)
+        for name in names:
+            pipeline.hgetall(f"{KEY_PREFIX}:{name}")
+
+        return {
+            name: {key.decode(): int(value) for key, value in counts.items()}
+            for name, counts in zip(names, pipeline.execute())
+        }
+
+
+@cache
+def get_exporter() -> RedisExporter | None:
+    if not settings.METRICS_REDIS_URL:
+        return None
+
+    return RedisExporter(settings.METRICS_REDIS_URL)
+
+
+class Counters:
+    """
+        Thread-safe counters of the process, exposed for monitoring by `snapshot`.
+        Increments are exported at most every METRICS_FLUSH_INTERVAL seconds
+        if METRICS_REDIS_URL is set, so processes other than the web worker are seen too.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._counter: Counter[str] = Counter()
+        # increments which are not exported yet
+        self._pending: Counter[str] = Counter()
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def increment(self, key: str, value: int = 1) -> None:
+        with self._lock:
+            self._counter[key] += value
+            self._pending[key] += value
+            due = time.monotonic() - self._flushed_at >= settings.METRICS_FLUSH_INTERVAL
+
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        exporter = get_exporter()
+        if exporter is None:
+            return
+
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._flushed_at = time.monotonic()
+
+        if not pending:
+            return
+
+        try:
+            exporter.flush(self.name, dict(pending))
+        except redis.RedisError as exc:
+            logger.error(f"Failed to export '{self.name}' metrics: {exc!r}")
+            with self._lock:
+                self._pending.update(pending)
+
+    def get(self, key: str) -> int:
+        return self._counter[key]
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._counter)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counter.clear()
+            self._pending.clear()
+
+
+# every Counters instance registered for the metrics endpoint
+REGISTRY: dict[str, Counters] = {}
+
+
+def get_counters(name: str) -> Counters:
+    if name not in REGISTRY:
+        REGISTRY.setdefault(name, Counters(name))
+
+    return REGISTRY[name]
+
+
+def snapshot() -> dict[str, dict[str, int]]:
+    """
+        Return counters summed over all processes if they are exported,
+        counters of this process otherwise or when Redis is unavailable.
+    """
+    exporter = get_exporter()
+
+    if exporter is not None:
+        for counters in REGISTRY.values():
+            counters.flush()
+
+        try:
+            return exporter.read()
+        except redis.RedisError as exc:
+            logger.error(f"Failed to read exported metrics: {exc!r}")
+
+    return {name: counters.snapshot() for name, counters in REGISTRY.items()}
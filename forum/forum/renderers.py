@@ -0,0 +1,31 @@
+from rest_framework.renderers import JSONRenderer
+
+from .encoders import JSONEncoder, dumps, orjson
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+        JSONRenderer using `forum.encoders`, which also handles ObjectId and Enum values.
+
+        Responses are rendered by DRF when orjson is not installed, for indented
+        responses (`; indent=` media type parameter) and when COMPACT_JSON is off
+        or UNICODE_JSON is off, since orjson has no options for them.
+        Unlike DRF with STRICT_JSON, orjson renders NaN and Infinity as null
+        instead of raising an error.
+    """
+    encoder_class = JSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if (
+            orjson is None
+            or not self.compact
+            or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # escaped like in DRF, as they are not valid in JavaScript strings
+        return dumps(data).replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
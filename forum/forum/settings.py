@@ -110,20 +110,111 @@ ASGI_APPLICATION = "forum.asgi.application"
 WSGI_APPLICATION = 'forum.wsgi.application'
 
 # setup channels
+
+# comma separated `host:port` list, channels and groups are spread over the hosts
+# with consistent hashing, so every process should use the same list in the same order
+CHANNEL_REDIS_HOSTS = [
+    (host, int(port or 6379))
+    for host, _, port in (
+        address.strip().partition(':')
+        for address in environ.get(
+            'FORUM_CHANNEL_REDIS_HOSTS',
+            f"{environ.get('FORUM_REDIS_HOST', 'localhost')}:{environ.get('FORUM_REDIS_PORT', 6379)}"
+        ).split(',')
+        if address.strip()
+    )
+]
+# max number of messages waiting in a channel, messages to full channels are dropped
+CHANNEL_CAPACITY = int(environ.get('FORUM_CHANNEL_CAPACITY', 100))
+CHANNEL_EXPIRY = int(environ.get('FORUM_CHANNEL_EXPIRY', 60))
+CHANNEL_GROUP_EXPIRY = int(environ.get('FORUM_CHANNEL_GROUP_EXPIRY', 86400))
+
 CHANNEL_LAYERS = {
     "default": {
-        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "BACKEND": "communications.channel_layers.MonitoredRedisChannelLayer",
         "CONFIG": {
-            "hosts": [
-                (
-                    environ.get('FORUM_REDIS_HOST', 'localhost'),
-                    environ.get('FORUM_REDIS_PORT', 6379)
-                ),
-            ],
+            "hosts": CHANNEL_REDIS_HOSTS,
+            "capacity": CHANNEL_CAPACITY,
+            "expiry": CHANNEL_EXPIRY,
+            "group_expiry": CHANNEL_GROUP_EXPIRY,
         },
     },
 }
 
+# in-memory layer for single process local runs and benchmarks without Redis
+if environ.get('FORUM_CHANNEL_LAYER_BACKEND') == 'memory':
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer",
+            "CONFIG": {
+                "capacity": CHANNEL_CAPACITY,
+                "expiry": CHANNEL_EXPIRY,
+                "group_expiry": CHANNEL_GROUP_EXPIRY,
+            },
+        },
+    }
+
+# monitoring counters of all processes (web, daphne, Celery) are summed in Redis,
+# the metrics endpoint shows counters of the serving process only if empty
+METRICS_REDIS_URL = environ.get(
+    'FORUM_METRICS_REDIS_URL',
+    f"redis://{environ.get('FORUM_REDIS_HOST', 'localhost')}:{environ.get('FORUM_REDIS_PORT', 6379)}/1"
+)
+# seconds between exports of counters of a process
+METRICS_FLUSH_INTERVAL = int(environ.get('FORUM_METRICS_FLUSH_INTERVAL', 10))
+
+# in-process cache of chat rooms used by permissions and serializers
+ROOM_CACHE_SIZE = int(environ.get('FORUM_ROOM_CACHE_SIZE', 1024))
+ROOM_CACHE_TTL = int(environ.get('FORUM_ROOM_CACHE_TTL', 30))
+
+# in-process cache of startup / investor ownership checks
+NAMESPACE_OWNERSHIP_CACHE_SIZE = int(environ.get('FORUM_NAMESPACE_OWNERSHIP_CACHE_SIZE', 4096))
+NAMESPACE_OWNERSHIP_CACHE_TTL = int(environ.get('FORUM_NAMESPACE_OWNERSHIP_CACHE_TTL', 300))
+
+# in-process cache of notification preferences, entries are invalidated on write
+NOTIFICATION_PREFERENCES_CACHE_SIZE = int(environ.get('FORUM_NOTIFICATION_PREFERENCES_CACHE_SIZE', 4096))
+NOTIFICATION_PREFERENCES_CACHE_TTL = int(environ.get('FORUM_NOTIFICATION_PREFERENCES_CACHE_TTL', 60))
+
+# in-process cache of users resolved by JWT authentication, invalidated on user save
+USER_CACHE_SIZE = int(environ.get('FORUM_USER_CACHE_SIZE', 4096))
+USER_CACHE_TTL = int(environ.get('FORUM_USER_CACHE_TTL', 60))
+
+# threads used by websocket consumers for blocking MongoDB calls
+MONGO_EXECUTOR_WORKERS = int(environ.get('FORUM_MONGO_EXECUTOR_WORKERS', 16))
+
+# max number of concurrent channel layer group sends of a single notification
+NOTIFICATION_FANOUT_CONCURRENCY = int(environ.get('FORUM_NOTIFICATION_FANOUT_CONCURRENCY', 100))
+
+# push notifications from Celery workers, disable to push them in the request process
+NOTIFICATION_DISPATCH_ASYNC = bool(int(environ.get('FORUM_NOTIFICATION_DISPATCH_ASYNC', 1)))
+
+# notifications of the same initiator, receiver and type sent within this number
+# of seconds are merged into one, 0 disables coalescing
+NOTIFICATION_COALESCE_WINDOW = int(environ.get('FORUM_NOTIFICATION_COALESCE_WINDOW', 60))
+# coalescing state is shared between workers through Redis, local memory is used if empty
+NOTIFICATION_COALESCE_REDIS_URL = environ.get('FORUM_NOTIFICATION_COALESCE_REDIS_URL', '')
+
+# max number of chat room groups a notifications websocket may join
+CHAT_ROOMS_PER_SOCKET = int(environ.get('FORUM_CHAT_ROOMS_PER_SOCKET', 20))
+
+# frames a notifications websocket may send per second and at once (token bucket),
+# a bulk acknowledgement costs a frame per notification id
+WS_FRAME_RATE = int(environ.get('FORUM_WS_FRAME_RATE', 20))
+WS_FRAME_BURST = int(environ.get('FORUM_WS_FRAME_BURST', 100))
+
+# consecutive rate limited frames after which the websocket is closed
+WS_RATE_LIMIT_STRIKES = int(environ.get('FORUM_WS_RATE_LIMIT_STRIKES', 50))
+
+# frames waiting to be written to a notifications websocket before they are dropped
+WS_OUTBOUND_QUEUE_SIZE = int(environ.get('FORUM_WS_OUTBOUND_QUEUE_SIZE', 100))
+
+# overflows of the outbound queue after which a slow websocket is closed
+WS_MAX_OVERFLOWS = int(environ.get('FORUM_WS_MAX_OVERFLOWS', 3))
+
+# notifications missed while the websocket was down, sent on connect with `since` cursor
+NOTIFICATION_BACKFILL_BATCH_SIZE = int(environ.get('FORUM_NOTIFICATION_BACKFILL_BATCH_SIZE', 50))
+NOTIFICATION_BACKFILL_LIMIT = int(environ.get('FORUM_NOTIFICATION_BACKFILL_LIMIT', 500))
+
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
@@ -184,11 +275,16 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'users.CustomUser'
 
 REST_FRAMEWORK = {
+    # uses orjson if the fast-json extra is installed, see forum.renderers
+    'DEFAULT_RENDERER_CLASSES': [
+        'forum.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_THROTTLE_CLASSES': [
         'rest_framework.throttling.AnonRateThrottle',
@@ -251,6 +347,7 @@ EMAIL_PORT = environ.get('FORUM_EMAIL_PORT', '8025')
 EMAIL_HOST_USER = environ.get('FORUM_EMAIL_USER', '')
 EMAIL_HOST_PASSWORD = environ.get('FORUM_EMAIL_USER_PASSWORD', '')
 EMAIL_USE_TLS = environ.get('FORUM_EMAIL_USE_TLS')
+EMAIL_BULK_CHUNK_SIZE = int(environ.get('FORUM_EMAIL_BULK_CHUNK_SIZE', 100))
 
 
 # Celery configuration
@@ -259,6 +356,19 @@ CELERY_BROKER_URL = environ.get('FORUM_CELERY_BROKER_URL', 'redis://localhost:63
 CELERY_RESULT_BACKEND = 'django-db'
 
 
+# Notifications storage
+
+# notifications older than this are moved to the archive collection, 0 disables archival
+NOTIFICATION_ARCHIVE_AFTER_DAYS = int(environ.get('FORUM_NOTIFICATION_ARCHIVE_AFTER_DAYS', 0))
+NOTIFICATION_ARCHIVE_BATCH_SIZE = int(environ.get('FORUM_NOTIFICATION_ARCHIVE_BATCH_SIZE', 500))
+# notifications older than this are removed by a MongoDB TTL index, 0 disables expiry.
+# Off unless archival is on, then it only removes what the archival missed.
+# Apply changes to existing collections with `manage.py sync_notification_indexes`.
+NOTIFICATION_TTL_DAYS = int(
+    environ.get('FORUM_NOTIFICATION_TTL_DAYS', NOTIFICATION_ARCHIVE_AFTER_DAYS * 2)
+)
+
+
 # Logging configuration
 
 LOGGING = {
@@ -270,6 +380,11 @@ LOGGING = {
             "class": "forum.logging.ColoredFormatter",
         },
     },
+    "filters": {
+        "channel_layer_overflow": {
+            "()": "communications.channel_layers.GroupOverflowFilter",
+        },
+    },
     "handlers": {
         "console": {
             "level": environ.get("FORUM_LOGGING_LEVEL", "INFO"),
@@ -282,6 +397,13 @@ LOGGING = {
             "handlers": ["console"],
             "propagate": True,
         },
+        # group_send overflows are logged at INFO level by channels_redis
+        "channels_redis.core": {
+            "handlers": ["console"],
+            "filters": ["channel_layer_overflow"],
+            "level": "INFO",
+            "propagate": False,
+        },
     },
 }
 
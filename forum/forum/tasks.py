@@ -1,9 +1,11 @@
 from datetime import timedelta
 from os import environ
+from typing import Any
 import smtplib
 
 from celery import shared_task
-from django.core.mail import send_mail
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection, send_mail
 from django.db.models.functions import Now
 
 from forum.logging import logger
@@ -29,6 +31,74 @@ def send_email_task(
     except Exception as e:
         logger.error(f"An error occurred during sending email: {str(e)}")
 
+def _send_email_chunk(messages: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+        Send messages over one SMTP connection and return those which were not sent.
+        Messages are passed to the connection one by one so a single rejected
+        recipient does not hide which messages were actually delivered.
+    """
+    failed: list[dict[str, Any]] = []
+    pending = list(messages)
+
+    try:
+        with get_connection() as connection:
+            while pending:
+                message = pending.pop(0)
+                email_message = EmailMessage(
+                    subject=message["subject"],
+                    body=message["body"],
+                    from_email=message["sender"],
+                    to=message["receivers"]
+                )
+                try:
+                    connection.send_messages([email_message])
+                except smtplib.SMTPRecipientsRefused as e:
+                    logger.error(f"SMTP recipients refused: {e}")
+                    failed.append(message)
+                except smtplib.SMTPException:
+                    failed.append(message)
+                    raise
+    except (smtplib.SMTPException, OSError) as e:
+        logger.error(f"SMTP error occurred: {e}")
+        failed.extend(pending)
+
+    return failed
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=300)
+def send_bulk_email_task(
+    self,
+    messages: list[dict[str, Any]],
+    chunk_size: int | None = None
+) -> dict[str, Any]:
+    """
+        Send personalized emails in chunks, one SMTP connection per chunk.
+
+        Every message is a dict with `subject`, `body`, `sender` and `receivers` keys.
+        Only messages which failed to be sent are retried.
+
+    Returns:
+        dict: number of sent messages and receivers of messages which failed to be sent
+    """
+    chunk_size = chunk_size or settings.EMAIL_BULK_CHUNK_SIZE
+    failed: list[dict[str, Any]] = []
+
+    for start in range(0, len(messages), chunk_size):
+        failed.extend(_send_email_chunk(messages[start:start + chunk_size]))
+
+    if failed and self.request.retries < self.max_retries:
+        logger.warning(f"{len(failed)} of {len(messages)} emails failed, retrying")
+        raise self.retry(kwargs={"messages": failed, "chunk_size": chunk_size})
+
+    if failed:
+        logger.error(f"{len(failed)} of {len(messages)} emails were not sent")
+
+    return {
+        "sent": len(messages) - len(failed),
+        "failed": [message["receivers"] for message in failed]
+    }
+
+
 @shared_task(bind=True)
 def password_reset_ttl_task(self):
     # we should import model on demand cause we could get an error if we imported it globally
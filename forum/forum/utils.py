@@ -1,6 +1,7 @@
 from typing import Any
 
 from django.template.loader import render_to_string
+from rest_framework.exceptions import ValidationError
 
 
 def build_email_message(
@@ -12,6 +13,17 @@ def build_email_message(
         context
     )
 
+def get_page_size(request, default: int, maximum: int) -> int:
+    """
+    Page size from the `limit` query parameter, clamped to 1..maximum
+    """
+    try:
+        limit = int(request.query_params.get("limit", default))
+    except ValueError as exc:
+        raise ValidationError("Invalid limit") from exc
+
+    return min(max(limit, 1), maximum)
+
 def get_changed_fields(old_instance, new_instance):
     """
     Comparing model fields for any changes from old and new (updated) 
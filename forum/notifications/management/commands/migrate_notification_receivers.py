@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from notifications.services import NotificationService
+
+
+class Command(BaseCommand):
+    help = "Move receivers embedded into notifications of the former format to inbox rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of notifications migrated at a time."
+        )
+
+    def handle(self, *args, **options):
+        migrated = NotificationService.migrate_embedded_receivers(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Migrated {migrated} notifications."))
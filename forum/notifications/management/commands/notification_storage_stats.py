@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from communications.mongo_models import Notification
+from notifications.services import ARCHIVE_COLLECTION, NotificationService
+
+COLLECTIONS = ("notification", "notification_inbox", ARCHIVE_COLLECTION)
+
+
+class Command(BaseCommand):
+    help = "Report storage size of notification collections, optionally archiving old notifications."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--archive",
+            action="store_true",
+            help="Archive old notifications and report storage before and after."
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.NOTIFICATION_ARCHIVE_AFTER_DAYS,
+            help="Archive notifications older than this number of days."
+        )
+
+    def handle(self, *args, **options):
+        database = Notification._get_collection().database
+
+        self.report(database)
+
+        if not options["archive"]:
+            return
+
+        if options["days"] <= 0:
+            raise CommandError("--days should be positive to archive notifications.")
+
+        archived = NotificationService.archive(
+            older_than=datetime.utcnow() - timedelta(days=options["days"]),
+            batch_size=settings.NOTIFICATION_ARCHIVE_BATCH_SIZE
+        )
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} notifications."))
+
+        self.report(database)
+
+    def report(self, database):
+        existing = set(database.list_collection_names())
+
+        for name in COLLECTIONS:
+            if name not in existing:
+                self.stdout.write(f"{name}: does not exist")
+                continue
+
+            stats = database.command("collStats", name)
+            self.stdout.write(
+                f"{name}: count={stats['count']} size={stats['size']} "
+                f"storageSize={stats['storageSize']} totalIndexSize={stats['totalIndexSize']}"
+            )
+            for index, size in stats["indexSizes"].items():
+                self.stdout.write(f"    {index}: {size}")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from notifications.services import NotificationService
+
+
+class Command(BaseCommand):
+    help = "Apply NOTIFICATION_TTL_DAYS to created_at indexes of existing notification collections."
+
+    def handle(self, *args, **options):
+        for collection, action in NotificationService.sync_expiry_indexes().items():
+            self.stdout.write(f"{collection}: {action}")
@@ -15,6 +15,8 @@ class NotificationSerializer(serializers.Serializer):
     notification_id = serializers.CharField(source="id", read_only=True)
     initiator = NamespaceInfoSerializer()
     message = serializers.CharField(max_length=255)
+    # number of coalesced events, stored per receiver in the inbox
+    count = serializers.IntegerField(read_only=True, default=1)
     created_at = serializers.DateTimeField()
     url = serializers.SerializerMethodField()
 
@@ -24,3 +26,39 @@ class NotificationSerializer(serializers.Serializer):
             user_id=obj.initiator.user_id,
             namespace_id=obj.initiator.namespace_id
         )
+
+
+class NotificationBulkAckSerializer(serializers.Serializer):
+    notification_ids = serializers.ListField(
+        child=serializers.CharField(),
+        allow_empty=False,
+        max_length=100
+    )
+
+
+_created_at_field = serializers.DateTimeField()
+
+
+def serialize_raw_notification(document: dict) -> dict:
+    """
+        Build the same representation as NotificationSerializer from a raw
+        MongoDB document without hydrating a mongoengine Document.
+    """
+    initiator = document["initiator"]
+
+    return {
+        "notification_id": str(document["_id"]),
+        "initiator": {
+            "user_id": initiator["user_id"],
+            "namespace": initiator["namespace"],
+            "namespace_id": initiator["namespace_id"],
+        },
+        "message": document["message"],
+        "count": document.get("count", 1),
+        "created_at": _created_at_field.to_representation(document["created_at"]),
+        "url": URLGenerator.generate_url(
+            namespace=initiator["namespace"],
+            user_id=initiator["user_id"],
+            namespace_id=initiator["namespace_id"]
+        ),
+    }
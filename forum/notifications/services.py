@@ -1,10 +1,388 @@
+from collections import defaultdict
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import ASCENDING, ReplaceOne, UpdateOne
+from pymongo.collection import Collection
+from pymongo.errors import CollectionInvalid
+from rest_framework.exceptions import ValidationError
+
+from communications.helpers import filter_by_cursor
+from communications.mongo_models import (
+    NOTIFICATION_EXPIRY_INDEX,
+    Notification,
+    NotificationInbox,
+    notification_expiry_seconds,
+)
+
+INBOX_FIELDS = ("initiator", "message", "created_at")
+
+ARCHIVE_COLLECTION = "notification_archive"
+# archived notifications are rarely read, so they are stored with a stronger compression
+ARCHIVE_STORAGE_ENGINE = {"wiredTiger": {"configString": "block_compressor=zstd"}}
+
+
 class NotificationService:
     @staticmethod
-    def mark_notification_as_read(notification, user_id):
-        notification.update_one(
-            __raw__={
-                "$pull": {
-                    "receivers": {"user_id": user_id}
-                }
-            }
-        )
\ No newline at end of file
+    def get_inbox(user_id: int, *, limit: int, before: ObjectId | None = None) -> list[dict]:
+        """
+            Return a page of user notifications, newest first, as raw projected documents.
+
+        Args:
+            user_id (int): id of the receiver
+            limit (int): max number of notifications in the page
+            before (ObjectId, optional): return notifications created before this one. Defaults to None.
+
+        Raises:
+            ValidationError: if the cursor notification is not addressed to the user
+        """
+        inbox = NotificationInbox.objects(user_id=user_id)
+
+        if before:
+            cursor = inbox.filter(notification=before).only("created_at").first()
+            if not cursor:
+                raise ValidationError("Invalid cursor.")
+
+            inbox = filter_by_cursor(
+                inbox,
+                "created_at",
+                cursor.created_at,
+                before,
+                descending=True,
+                id_field="notification"
+            )
+
+        counts = {
+            row["notification"]: row.get("count", 1) for row in
+            inbox
+            .only("notification", "count")
+            .order_by("-created_at", "-notification")
+            .limit(limit)
+            .as_pymongo()
+        }
+
+        return NotificationService._load_payloads(counts)
+
+    @staticmethod
+    def get_since(
+        user_id: int,
+        *,
+        since: ObjectId,
+        limit: int,
+        since_created_at: datetime | None = None
+    ) -> tuple[list[dict], tuple[datetime, ObjectId] | None]:
+        """
+            Return notifications of the user pushed after `since`, oldest first,
+            and the (created_at, id) cursor of the next page, None if there are no more rows.
+
+            ObjectIds generated by different processes within a second are not ordered,
+            so rows are paged by (created_at, notification). `since_created_at` is the time
+            of the cursor, it is looked up if omitted. `since` does not have to exist anymore
+            (e.g. after it was acknowledged), then the whole second of its id is sent again,
+            clients deduplicate notifications by id.
+        """
+        inbox = NotificationInbox.objects(user_id=user_id)
+
+        if since_created_at is None:
+            since_created_at = NotificationService._get_created_at(user_id, since)
+
+        if since_created_at is None:
+            inbox = inbox.filter(created_at__gte=since.generation_time.replace(tzinfo=None))
+        else:
+            inbox = filter_by_cursor(
+                inbox,
+                "created_at",
+                since_created_at,
+                since,
+                descending=False,
+                id_field="notification"
+            )
+
+        rows = list(
+            inbox
+            .only("notification", "count", "created_at")
+            .order_by("created_at", "notification")
+            .limit(limit)
+            .as_pymongo()
+        )
+
+        # the page is full even if payloads of some rows are gone
+        next_cursor = (rows[-1]["created_at"], rows[-1]["notification"]) if len(rows) == limit else None
+        counts = {row["notification"]: row.get("count", 1) for row in rows}
+
+        return NotificationService._load_payloads(counts), next_cursor
+
+    @staticmethod
+    def _get_created_at(user_id: int, notification_id: ObjectId) -> datetime | None:
+        row = (
+            NotificationInbox.objects(user_id=user_id, notification=notification_id)
+            .only("created_at")
+            .as_pymongo()
+            .first()
+        )
+        if row is None:
+            row = Notification.objects(pk=notification_id).only("created_at").as_pymongo().first()
+
+        return row["created_at"] if row else None
+
+    @staticmethod
+    def _load_payloads(counts: dict[ObjectId, int]) -> list[dict]:
+        """
+            Fetch projected payloads of the notifications keeping the order of `counts`.
+        """
+        if not counts:
+            return []
+
+        notifications = {
+            notification["_id"]: notification for notification in
+            Notification.objects(pk__in=list(counts)).only(*INBOX_FIELDS).as_pymongo()
+        }
+
+        return [
+            notifications[notification_id] | {"count": count}
+            for notification_id, count in counts.items()
+            if notification_id in notifications
+        ]
+
+    @staticmethod
+    def _release(notification_ids: list[ObjectId]) -> None:
+        """
+            Delete notifications which have no inbox rows left.
+            Acks read the inbox index only, the shared notification is written
+            once, when its last receiver acknowledged it. Every ack deletes its rows
+            before the lookup, so the last of concurrent acks sees no rows left.
+        """
+        referenced = set(NotificationInbox._get_collection().distinct(
+            "notification", {"notification": {"$in": notification_ids}}
+        ))
+        orphaned = [
+            notification_id for notification_id in notification_ids
+            if notification_id not in referenced
+        ]
+        if orphaned:
+            Notification._get_collection().delete_many({"_id": {"$in": orphaned}})
+
+    @staticmethod
+    def ack(notification_id: ObjectId, user_id: int) -> Notification | None:
+        """
+            Mark the notification as read by the user.
+            The notification is deleted once every receiver acknowledged it.
+
+        Returns:
+            Notification | None: acknowledged notification or None if the user is not its receiver
+        """
+        inbox_row = NotificationInbox._get_collection().find_one_and_delete(
+            {"notification": notification_id, "user_id": user_id},
+            projection={"_id": True}
+        )
+        if inbox_row is None:
+            return None
+
+        document = Notification._get_collection().find_one({"_id": notification_id})
+        NotificationService._release([notification_id])
+
+        return Notification._from_son(document) if document else None
+
+    @staticmethod
+    def ack_many(notification_ids: list[ObjectId], user_id: int) -> int:
+        """
+            Mark many notifications as read by the user
+            with one delete of the inbox rows.
+
+        Returns:
+            int: number of acknowledged notifications
+        """
+        result = NotificationInbox._get_collection().delete_many(
+            {"notification": {"$in": notification_ids}, "user_id": user_id}
+        )
+        if result.deleted_count:
+            # rows acknowledged concurrently are released by both acks, which is harmless
+            NotificationService._release(notification_ids)
+
+        return result.deleted_count
+
+    @staticmethod
+    def migrate_embedded_receivers(batch_size: int) -> int:
+        """
+            Move receivers embedded into notifications of the former format
+            to inbox rows, `batch_size` notifications at a time.
+
+        Returns:
+            int: number of migrated notifications
+        """
+        notifications = Notification._get_collection()
+        inbox = NotificationInbox._get_collection()
+        migrated = 0
+
+        while True:
+            batch = list(
+                notifications
+                .find({"receivers": {"$exists": True}}, {"receivers": True, "created_at": True})
+                .limit(batch_size)
+            )
+            if not batch:
+                break
+
+            # upserts keep the batch idempotent if a previous run failed halfway
+            rows = [
+                UpdateOne(
+                    {"notification": notification["_id"], "user_id": receiver["user_id"]},
+                    {"$setOnInsert": {
+                        "namespace": receiver["namespace"],
+                        "namespace_id": receiver["namespace_id"],
+                        "count": 1,
+                        "created_at": notification.get("created_at")
+                        or notification["_id"].generation_time.replace(tzinfo=None),
+                    }},
+                    upsert=True
+                )
+                for notification in batch
+                for receiver in {
+                    receiver["user_id"]: receiver for receiver in notification["receivers"]
+                }.values()
+            ]
+            if rows:
+                inbox.bulk_write(rows, ordered=False)
+
+            notifications.bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": notification["_id"]},
+                        {
+                            "$set": {"pending_receivers": len({
+                                receiver["user_id"] for receiver in notification["receivers"]
+                            })},
+                            "$unset": {"receivers": ""}
+                        }
+                    )
+                    for notification in batch
+                ],
+                ordered=False
+            )
+            # notifications whose receivers all acknowledged them are deleted
+            NotificationService._release([notification["_id"] for notification in batch])
+
+            migrated += len(batch)
+
+        return migrated
+
+    @staticmethod
+    def sync_expiry_indexes() -> dict[str, str]:
+        """
+            Bring `created_at` indexes of notification collections in line with
+            NOTIFICATION_TTL_DAYS. mongoengine only creates missing indexes, an index
+            with other options makes its index creation fail with IndexOptionsConflict.
+
+        Returns:
+            dict[str, str]: action taken for every collection
+        """
+        expire_after_seconds = notification_expiry_seconds()
+        actions = {}
+
+        for document_class in (Notification, NotificationInbox):
+            # raw collection, `_get_collection` would create indexes of the document
+            collection = document_class._get_db()[document_class._get_collection_name()]
+            actions[collection.name] = NotificationService._sync_expiry_index(
+                collection, expire_after_seconds
+            )
+
+        return actions
+
+    @staticmethod
+    def _sync_expiry_index(collection: Collection, expire_after_seconds: int | None) -> str:
+        indexes = collection.index_information()
+        index = indexes.get(NOTIFICATION_EXPIRY_INDEX)
+        options = {} if expire_after_seconds is None else {"expireAfterSeconds": expire_after_seconds}
+
+        if index is None:
+            # unnamed index created before the index got its name
+            if "created_at_1" in indexes:
+                collection.drop_index("created_at_1")
+
+            collection.create_index([("created_at", ASCENDING)], name=NOTIFICATION_EXPIRY_INDEX, **options)
+            return "created"
+
+        if index.get("expireAfterSeconds") == expire_after_seconds:
+            return "unchanged"
+
+        if expire_after_seconds is None:
+            # expiry can not be removed from an index, it is recreated without it
+            collection.drop_index(NOTIFICATION_EXPIRY_INDEX)
+            collection.create_index([("created_at", ASCENDING)], name=NOTIFICATION_EXPIRY_INDEX)
+            return "expiry disabled"
+
+        collection.database.command(
+            "collMod",
+            collection.name,
+            index={"name": NOTIFICATION_EXPIRY_INDEX, "expireAfterSeconds": expire_after_seconds}
+        )
+        return "updated"
+
+    @staticmethod
+    def get_archive_collection() -> Collection:
+        database = Notification._get_collection().database
+
+        if not database.list_collection_names(filter={"name": ARCHIVE_COLLECTION}):
+            try:
+                database.create_collection(
+                    ARCHIVE_COLLECTION,
+                    storageEngine=ARCHIVE_STORAGE_ENGINE
+                )
+            except CollectionInvalid:
+                # created concurrently
+                pass
+
+        return database[ARCHIVE_COLLECTION]
+
+    @staticmethod
+    def archive(older_than: datetime, batch_size: int) -> int:
+        """
+            Move notifications created before `older_than` with their inbox rows
+            to the compressed archive collection, `batch_size` notifications at a time.
+
+        Returns:
+            int: number of archived notifications
+        """
+        notifications = Notification._get_collection()
+        inbox = NotificationInbox._get_collection()
+        archive = NotificationService.get_archive_collection()
+        archived = 0
+
+        while True:
+            batch = list(
+                notifications
+                .find({"created_at": {"$lt": older_than}})
+                .sort("created_at", ASCENDING)
+                .limit(batch_size)
+            )
+            if not batch:
+                break
+
+            notification_ids = [notification["_id"] for notification in batch]
+
+            receivers = defaultdict(list)
+            for row in inbox.find(
+                {"notification": {"$in": notification_ids}},
+                {"_id": False, "notification": True, "user_id": True,
+                 "namespace": True, "namespace_id": True}
+            ):
+                receivers[row.pop("notification")].append(row)
+
+            # upserts keep the batch idempotent if a previous run failed halfway
+            archive.bulk_write(
+                [
+                    ReplaceOne(
+                        {"_id": notification["_id"]},
+                        notification | {"receivers": receivers[notification["_id"]]},
+                        upsert=True
+                    )
+                    for notification in batch
+                ],
+                ordered=False
+            )
+            inbox.delete_many({"notification": {"$in": notification_ids}})
+            notifications.delete_many({"_id": {"$in": notification_ids}})
+
+            archived += len(batch)
+
+        return archived
@@ -0,0 +1,22 @@
+from datetime import datetime, timedelta
+
+from celery import shared_task
+from django.conf import settings
+
+from forum.logging import logger
+
+from .services import NotificationService
+
+
+@shared_task(bind=True)
+def archive_notifications_task(self) -> int:
+    if not settings.NOTIFICATION_ARCHIVE_AFTER_DAYS:
+        return 0
+
+    archived = NotificationService.archive(
+        older_than=datetime.utcnow() - timedelta(days=settings.NOTIFICATION_ARCHIVE_AFTER_DAYS),
+        batch_size=settings.NOTIFICATION_ARCHIVE_BATCH_SIZE
+    )
+    logger.info(f"{archived} notifications were archived")
+
+    return archived
@@ -1,3 +1,449 @@
-from django.test import TestCase
+from datetime import datetime, timedelta
+from unittest import TestCase
+from unittest.mock import patch
 
-# Create your tests here.
+from bson import ObjectId
+from django.test import override_settings
+from pymongo import ASCENDING
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+from communications.mongo_models import (
+    NOTIFICATION_EXPIRY_INDEX,
+    NamespaceEnum,
+    NamespaceInfo,
+    Notification,
+    NotificationInbox,
+    notification_ttl_indexes,
+)
+from notifications.serializers import NotificationSerializer, serialize_raw_notification
+from notifications.services import NotificationService
+from notifications.tasks import archive_notifications_task
+from forum.tests_setup import UserSetupMixin
+
+
+class NotificationServiceAckTestCase(TestCase):
+    RECEIVERS = (1_000_011, 1_000_012)
+
+    def setUp(self):
+        self.notification_ids = [ObjectId(), ObjectId()]
+        initiator = NamespaceInfo(user_id=2, namespace=NamespaceEnum.STARTUP, namespace_id=3)
+
+        for notification_id in self.notification_ids:
+            Notification(
+                id=notification_id,
+                initiator=initiator,
+                message="test message",
+                receivers_count=len(self.RECEIVERS)
+            ).save(force_insert=True)
+            NotificationInbox.objects.insert([
+                NotificationInbox(
+                    notification=notification_id,
+                    user_id=user_id,
+                    namespace=NamespaceEnum.INVESTOR,
+                    namespace_id=4
+                )
+                for user_id in self.RECEIVERS
+            ])
+
+    def tearDown(self):
+        NotificationInbox.objects(notification__in=self.notification_ids).delete()
+        Notification.objects(pk__in=self.notification_ids).delete()
+
+    def exists(self, notification_id: ObjectId) -> bool:
+        return Notification.objects(pk=notification_id).count() == 1
+
+    def test_notification_is_deleted_after_last_ack(self):
+        first, second = self.RECEIVERS
+        notification_id = self.notification_ids[0]
+
+        notification = NotificationService.ack(notification_id, first)
+        self.assertEqual(notification.pk, notification_id)
+        self.assertTrue(self.exists(notification_id))
+
+        NotificationService.ack(notification_id, second)
+        self.assertFalse(self.exists(notification_id))
+
+    def test_ack_of_foreign_notification(self):
+        self.assertIsNone(NotificationService.ack(self.notification_ids[0], 1))
+        self.assertEqual(NotificationInbox.objects(notification=self.notification_ids[0]).count(), 2)
+
+    def test_ack_many_deletes_only_fully_acknowledged(self):
+        first, second = self.RECEIVERS
+        NotificationService.ack(self.notification_ids[0], second)
+
+        acknowledged = NotificationService.ack_many(self.notification_ids + [ObjectId()], first)
+
+        self.assertEqual(acknowledged, 2)
+        self.assertFalse(self.exists(self.notification_ids[0]))
+        self.assertTrue(self.exists(self.notification_ids[1]))
+        self.assertEqual(NotificationService.ack_many(self.notification_ids, first), 0)
+
+    def test_repeated_ack_many_is_harmless(self):
+        first, second = self.RECEIVERS
+
+        NotificationService.ack_many(self.notification_ids, first)
+        NotificationService.ack_many(self.notification_ids, first)
+        self.assertTrue(all(self.exists(notification_id) for notification_id in self.notification_ids))
+
+        self.assertEqual(NotificationService.ack_many(self.notification_ids, second), 2)
+        self.assertFalse(any(self.exists(notification_id) for notification_id in self.notification_ids))
+
+
+class EmbeddedReceiversMigrationTestCase(TestCase):
+    def setUp(self):
+        self.created_at = datetime(2024, 1, 1)
+        self.pending, self.read = ObjectId(), ObjectId()
+        # notifications stored in the former format
+        Notification._get_collection().insert_many([
+            {
+                "_id": self.pending,
+                "initiator": {"user_id": 2, "namespace": "startup", "namespace_id": 3},
+                "message": "pending",
+                "created_at": self.created_at,
+                "receivers": [
+                    {"user_id": 1_000_021, "namespace": "investor", "namespace_id": 4},
+                    {"user_id": 1_000_022, "namespace": "investor", "namespace_id": 5},
+                ],
+            },
+            {
+                "_id": self.read,
+                "initiator": {"user_id": 2, "namespace": "startup", "namespace_id": 3},
+                "message": "read",
+                "created_at": self.created_at,
+                "receivers": [],
+            },
+        ])
+
+    def tearDown(self):
+        NotificationInbox.objects(notification__in=[self.pending, self.read]).delete()
+        Notification._get_collection().delete_many({"_id": {"$in": [self.pending, self.read]}})
+
+    def test_receivers_are_moved_to_inbox(self):
+        self.assertEqual(NotificationService.migrate_embedded_receivers(batch_size=1), 2)
+        # a repeated run does nothing
+        self.assertEqual(NotificationService.migrate_embedded_receivers(batch_size=1), 0)
+
+        rows = NotificationInbox.objects(notification=self.pending).order_by("user_id")
+        self.assertEqual(
+            [(row.user_id, row.namespace_id, row.created_at) for row in rows],
+            [(1_000_021, 4, self.created_at), (1_000_022, 5, self.created_at)]
+        )
+
+        notification = Notification._get_collection().find_one({"_id": self.pending})
+        self.assertNotIn("receivers", notification)
+        self.assertEqual(notification["pending_receivers"], 2)
+        self.assertIsNone(Notification._get_collection().find_one({"_id": self.read}))
+
+
+def object_id(timestamp: int, process: int) -> ObjectId:
+    """
+        ObjectId generated by the process at the second, the process part
+        orders ids of the same second regardless of their creation order.
+    """
+    return ObjectId(timestamp.to_bytes(4, "big") + process.to_bytes(5, "big") + bytes(3))
+
+
+class NotificationServiceSinceTestCase(TestCase):
+    USER_ID = 1_000_001
+    SECOND = 1_720_000_000
+
+    def setUp(self):
+        start = datetime.utcfromtimestamp(self.SECOND)
+        # (id, created_at) in the order notifications were created
+        self.rows = {
+            "before": (object_id(self.SECOND, 9), start + timedelta(milliseconds=50)),
+            "cursor": (object_id(self.SECOND, 5), start + timedelta(milliseconds=100)),
+            # created after the cursor by another process with a smaller id
+            "other_process": (object_id(self.SECOND, 1), start + timedelta(milliseconds=200)),
+            "next_second": (object_id(self.SECOND + 1, 3), start + timedelta(seconds=1)),
+            "same_time": (object_id(self.SECOND + 1, 4), start + timedelta(seconds=1)),
+        }
+        initiator = NamespaceInfo(user_id=2, namespace=NamespaceEnum.STARTUP, namespace_id=3)
+
+        for name, (notification_id, created_at) in self.rows.items():
+            Notification(
+                id=notification_id,
+                initiator=initiator,
+                message=name,
+                receivers_count=1,
+                created_at=created_at
+            ).save(force_insert=True)
+            NotificationInbox(
+                notification=notification_id,
+                user_id=self.USER_ID,
+                namespace=NamespaceEnum.INVESTOR,
+                namespace_id=4,
+                created_at=created_at
+            ).save(force_insert=True)
+
+    def tearDown(self):
+        notification_ids = [notification_id for notification_id, _ in self.rows.values()]
+        NotificationInbox.objects(user_id=self.USER_ID).delete()
+        Notification.objects(pk__in=notification_ids).delete()
+
+    def get_all(self, since: ObjectId, limit: int) -> list[str]:
+        messages = []
+        since_created_at = None
+
+        while True:
+            batch, next_cursor = NotificationService.get_since(
+                self.USER_ID, since=since, limit=limit, since_created_at=since_created_at
+            )
+            messages += [document["message"] for document in batch]
+            if next_cursor is None:
+                return messages
+
+            since_created_at, since = next_cursor
+
+    def test_notifications_after_cursor_in_creation_order(self):
+        documents, next_cursor = NotificationService.get_since(
+            self.USER_ID, since=self.rows["cursor"][0], limit=10
+        )
+
+        self.assertEqual(
+            [document["message"] for document in documents],
+            ["other_process", "next_second", "same_time"]
+        )
+        self.assertIsNone(next_cursor)
+
+    def test_pages_are_resumed_from_cursor(self):
+        self.assertEqual(
+            self.get_all(self.rows["cursor"][0], limit=1),
+            ["other_process", "next_second", "same_time"]
+        )
+
+    def test_acknowledged_cursor_resends_its_second(self):
+        cursor_id = self.rows["cursor"][0]
+        NotificationInbox.objects(user_id=self.USER_ID, notification=cursor_id).delete()
+        Notification.objects(pk=cursor_id).delete()
+
+        self.assertEqual(
+            self.get_all(cursor_id, limit=2),
+            ["before", "other_process", "next_second", "same_time"]
+        )
+
+    def test_missing_payload_does_not_end_paging(self):
+        Notification.objects(pk=self.rows["other_process"][0]).delete()
+
+        documents, next_cursor = NotificationService.get_since(
+            self.USER_ID, since=self.rows["cursor"][0], limit=1
+        )
+
+        self.assertEqual(documents, [])
+        self.assertEqual(next_cursor, tuple(reversed(self.rows["other_process"])))
+        self.assertEqual(
+            self.get_all(self.rows["cursor"][0], limit=1),
+            ["next_second", "same_time"]
+        )
+
+
+class NotificationListPaginationTestCase(UserSetupMixin):
+    SECOND = 1_720_000_000
+
+    def setUp(self):
+        super().setUp()
+
+        start = datetime.utcfromtimestamp(self.SECOND)
+        initiator = NamespaceInfo(user_id=2, namespace=NamespaceEnum.STARTUP, namespace_id=3)
+        # the last two notifications share the time, the id orders them
+        self.notification_ids = [object_id(self.SECOND, process) for process in (1, 2, 3)]
+
+        for index, notification_id in enumerate(self.notification_ids):
+            created_at = start + timedelta(seconds=min(index, 1))
+            Notification(
+                id=notification_id,
+                initiator=initiator,
+                message=f"notification {index}",
+                receivers_count=1,
+                created_at=created_at
+            ).save(force_insert=True)
+            NotificationInbox(
+                notification=notification_id,
+                user_id=self.test_user.user_id,
+                namespace=NamespaceEnum.INVESTOR,
+                namespace_id=4,
+                created_at=created_at
+            ).save()
+
+    def tearDown(self):
+        NotificationInbox.objects(notification__in=self.notification_ids).delete()
+        Notification.objects(pk__in=self.notification_ids).delete()
+        super().tearDown()
+
+    def get_page(self, **params):
+        return self.client.get(reverse("notification_list"), params)
+
+    def get_messages(self, **params) -> list[str]:
+        response = self.get_page(**params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return [notification["message"] for notification in response.json()]
+
+    def test_pages_newest_first(self):
+        self.assertEqual(self.get_messages(limit=2), ["notification 2", "notification 1"])
+        self.assertEqual(
+            self.get_messages(limit=2, before=str(self.notification_ids[1])),
+            ["notification 0"]
+        )
+
+    def test_limit_is_clamped(self):
+        self.assertEqual(self.get_messages(limit=0), ["notification 2"])
+
+    def test_invalid_params_are_rejected(self):
+        for params in (
+            {"limit": "many"},
+            {"before": "invalid"},
+            {"before": str(ObjectId())},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.get_page(**params).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RawNotificationSerializationTestCase(TestCase):
+    def test_raw_document_matches_serializer_output(self):
+        document = {
+            "_id": ObjectId(),
+            "initiator": {"user_id": 2, "namespace": "startup", "namespace_id": 3},
+            "message": "test message",
+            "created_at": datetime(2024, 7, 25, 9, 24),
+        }
+        notification = Notification._from_son(document | {"pending_receivers": 1})
+
+        expected = dict(NotificationSerializer(notification).data)
+        expected["initiator"] = dict(expected["initiator"]) | {"namespace": "startup"}
+
+        self.assertEqual(serialize_raw_notification(document), expected)
+
+
+class NotificationArchiveTestCase(TestCase):
+    def setUp(self):
+        initiator = NamespaceInfo(user_id=2, namespace=NamespaceEnum.STARTUP, namespace_id=3)
+        self.older_than = datetime(2001, 1, 1)
+        self.old = [ObjectId(), ObjectId()]
+        self.recent = ObjectId()
+
+        for notification_id, created_at in (
+            (self.old[0], datetime(2000, 1, 1)),
+            (self.old[1], datetime(2000, 6, 1)),
+            (self.recent, self.older_than),
+        ):
+            Notification(
+                id=notification_id,
+                initiator=initiator,
+                message="test message",
+                receivers_count=1,
+                created_at=created_at
+            ).save(force_insert=True)
+            NotificationInbox(
+                notification=notification_id,
+                user_id=1_000_031,
+                namespace=NamespaceEnum.INVESTOR,
+                namespace_id=4,
+                created_at=created_at
+            ).save()
+
+    def tearDown(self):
+        notification_ids = self.old + [self.recent]
+        NotificationInbox.objects(notification__in=notification_ids).delete()
+        Notification.objects(pk__in=notification_ids).delete()
+        NotificationService.get_archive_collection().delete_many({"_id": {"$in": notification_ids}})
+
+    def test_notifications_are_moved_with_receivers(self):
+        self.assertEqual(NotificationService.archive(self.older_than, batch_size=1), 2)
+
+        archived = list(
+            NotificationService.get_archive_collection()
+            .find({"_id": {"$in": self.old + [self.recent]}})
+            .sort("created_at", ASCENDING)
+        )
+        self.assertEqual([notification["_id"] for notification in archived], self.old)
+        self.assertEqual(
+            archived[0]["receivers"],
+            [{"user_id": 1_000_031, "namespace": "investor", "namespace_id": 4}]
+        )
+
+        self.assertEqual(Notification.objects(pk__in=self.old).count(), 0)
+        self.assertEqual(NotificationInbox.objects(notification__in=self.old).count(), 0)
+        self.assertEqual(Notification.objects(pk=self.recent).count(), 1)
+        self.assertEqual(NotificationInbox.objects(notification=self.recent).count(), 1)
+
+    def test_nothing_to_archive(self):
+        self.assertEqual(NotificationService.archive(datetime(2000, 1, 1), batch_size=10), 0)
+        self.assertEqual(Notification.objects(pk__in=self.old).count(), 2)
+
+
+@patch.object(NotificationService, "archive", return_value=3)
+class ArchiveNotificationsTaskTestCase(TestCase):
+    @override_settings(NOTIFICATION_ARCHIVE_AFTER_DAYS=7, NOTIFICATION_ARCHIVE_BATCH_SIZE=100)
+    def test_old_notifications_are_archived(self, mock_archive):
+        self.assertEqual(archive_notifications_task(), 3)
+
+        older_than = mock_archive.call_args.kwargs["older_than"]
+        self.assertAlmostEqual(
+            older_than, datetime.utcnow() - timedelta(days=7), delta=timedelta(minutes=1)
+        )
+        self.assertEqual(mock_archive.call_args.kwargs["batch_size"], 100)
+
+    @override_settings(NOTIFICATION_ARCHIVE_AFTER_DAYS=0)
+    def test_disabled_archival(self, mock_archive):
+        self.assertEqual(archive_notifications_task(), 0)
+        mock_archive.assert_not_called()
+
+
+class NotificationExpiryIndexTestCase(TestCase):
+    def setUp(self):
+        # scratch collection, indexes of the real ones are left alone
+        self.collection = Notification._get_db()[f"expiry_index_{ObjectId()}"]
+
+    def tearDown(self):
+        self.collection.drop()
+
+    def get_expiry_indexes(self) -> dict[str, int | None]:
+        return {
+            name: index.get("expireAfterSeconds")
+            for name, index in self.collection.index_information().items()
+            if name != "_id_"
+        }
+
+    @override_settings(NOTIFICATION_TTL_DAYS=2)
+    def test_ttl_index_spec(self):
+        self.assertEqual(
+            notification_ttl_indexes(),
+            [{
+                "fields": ["created_at"],
+                "name": NOTIFICATION_EXPIRY_INDEX,
+                "expireAfterSeconds": 2 * 24 * 60 * 60
+            }]
+        )
+
+    @override_settings(NOTIFICATION_TTL_DAYS=0)
+    def test_plain_index_spec_without_expiry(self):
+        self.assertEqual(
+            notification_ttl_indexes(),
+            [{"fields": ["created_at"], "name": NOTIFICATION_EXPIRY_INDEX}]
+        )
+
+    def test_index_is_created_replacing_unnamed_one(self):
+        self.collection.create_index([("created_at", ASCENDING)])
+
+        self.assertEqual(NotificationService._sync_expiry_index(self.collection, 60), "created")
+        self.assertEqual(self.get_expiry_indexes(), {NOTIFICATION_EXPIRY_INDEX: 60})
+
+    def test_changed_expiry_is_modified_in_place(self):
+        NotificationService._sync_expiry_index(self.collection, 60)
+
+        self.assertEqual(NotificationService._sync_expiry_index(self.collection, 120), "updated")
+        self.assertEqual(self.get_expiry_indexes(), {NOTIFICATION_EXPIRY_INDEX: 120})
+
+    def test_disabled_expiry_recreates_plain_index(self):
+        NotificationService._sync_expiry_index(self.collection, 60)
+
+        self.assertEqual(NotificationService._sync_expiry_index(self.collection, None), "expiry disabled")
+        self.assertEqual(self.get_expiry_indexes(), {NOTIFICATION_EXPIRY_INDEX: None})
+
+    def test_matching_index_is_unchanged(self):
+        NotificationService._sync_expiry_index(self.collection, None)
+
+        self.assertEqual(NotificationService._sync_expiry_index(self.collection, None), "unchanged")
+        self.assertEqual(self.get_expiry_indexes(), {NOTIFICATION_EXPIRY_INDEX: None})
@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import NotificationListView, NotificationDetailView
+from .views import NotificationBulkAckView, NotificationListView, NotificationDetailView
 
 urlpatterns = [
     path('', NotificationListView.as_view(), name='notification_list'),
+    path('ack/', NotificationBulkAckView.as_view(), name='notification_bulk_ack'),
     path('<str:notification_id>/', NotificationDetailView.as_view(), name='notification_detail'),
 ]
\ No newline at end of file
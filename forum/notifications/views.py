@@ -1,25 +1,43 @@
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from users.authentication import ClaimsJWTAuthentication
 from users.permissions import get_token_payload_from_cookies
 from forum.config import ERROR_MESSAGES
+from forum.utils import get_page_size
 
-from .serializers import NotificationSerializer
+from .serializers import (
+    NotificationBulkAckSerializer,
+    NotificationSerializer,
+    serialize_raw_notification,
+)
 
-from communications.mongo_models import Notification
 from notifications.services import NotificationService
 from notifications.utils import extract_user_id_from_payload, validate_object_id
 
+NOTIFICATIONS_PAGE_SIZE = 20
+NOTIFICATIONS_MAX_PAGE_SIZE = 100
+
 
 class NotificationListView(APIView):
+    # only token claims are used, the user is not loaded
+    authentication_classes = [ClaimsJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     @swagger_auto_schema(
-        operation_description="Retrieve all notifications for the authenticated user.",
+        operation_description="Retrieve notifications for the authenticated user, newest first. \
+        Use notification_id of the last received notification as `before` to get the next page.",
         operation_summary="Retrieve user notifications",
+        manual_parameters=[
+            openapi.Parameter('before', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Notification id used as a cursor"),
+            openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description=f"Page size, max {NOTIFICATIONS_MAX_PAGE_SIZE}"),
+        ],
         responses={
             200: NotificationSerializer(many=True),
             400: openapi.Response(description=ERROR_MESSAGES['BAD_REQUEST']),
@@ -30,19 +48,31 @@ class NotificationListView(APIView):
         user_id, error = extract_user_id_from_payload(payload)
         if error:
             return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
-        
-        notifications = Notification.objects(receivers__user_id=user_id)
-        
-        serializer = NotificationSerializer(notifications, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+
+        before = request.query_params.get("before")
+        if before:
+            before, error = validate_object_id(before)
+            if error:
+                return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = get_page_size(request, NOTIFICATIONS_PAGE_SIZE, NOTIFICATIONS_MAX_PAGE_SIZE)
+            notifications = NotificationService.get_inbox(user_id, limit=limit, before=before)
+        except ValidationError as exc:
+            return Response({"error": exc.detail}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = [serialize_raw_notification(notification) for notification in notifications]
+        return Response(data, status=status.HTTP_200_OK)
 
 
 class NotificationDetailView(APIView):
+    # only token claims are used, the user is not loaded
+    authentication_classes = [ClaimsJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     @swagger_auto_schema(
-        operation_description="Mark a notification as read by removing the user from the receivers list. \
-        If no receivers are left, the notification is deleted.",
+        operation_description="Mark a notification as read by removing it from the user inbox. \
+        Once every receiver read the notification, it is deleted.",
         operation_summary="Mark notification as read",
         responses={
             200: NotificationSerializer(),
@@ -60,14 +90,45 @@ class NotificationDetailView(APIView):
         if error:
             return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
 
-        notification = Notification.objects(pk=notification_id, receivers__user_id=user_id)
+        notification = NotificationService.ack(notification_id, user_id)
         if not notification:
             return Response({"error": ERROR_MESSAGES['NOTIFICATION_NOT_FOUND']}, status=status.HTTP_404_NOT_FOUND)
-        notification_obj = notification.first()
-        
-        NotificationService.mark_notification_as_read(notification, user_id)
-        
-        serializer = NotificationSerializer(notification_obj)
-        if not notification_obj.reload().receivers:
-            notification_obj.delete()
+
+        serializer = NotificationSerializer(notification)
         return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class NotificationBulkAckView(APIView):
+    # only token claims are used, the user is not loaded
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Mark many notifications as read by removing them from the user inbox. \
+        Notifications read by every receiver are deleted.",
+        operation_summary="Mark notifications as read",
+        request_body=NotificationBulkAckSerializer,
+        responses={
+            200: openapi.Response(description="Number of acknowledged notifications"),
+            400: openapi.Response(description=ERROR_MESSAGES['BAD_REQUEST']),
+        }
+    )
+    def put(self, request):
+        serializer = NotificationBulkAckSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({"error": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        notification_ids = []
+        for notification_id in serializer.validated_data["notification_ids"]:
+            notification_id, error = validate_object_id(notification_id)
+            if error:
+                return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+            notification_ids.append(notification_id)
+
+        payload = get_token_payload_from_cookies(request)
+        user_id, error = extract_user_id_from_payload(payload)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        acknowledged = NotificationService.ack_many(notification_ids, user_id)
+        return Response({"acknowledged": acknowledged}, status=status.HTTP_200_OK)
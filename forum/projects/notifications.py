@@ -1,6 +1,6 @@
 from typing import Literal, TypeAlias
 from django.core.exceptions import ValidationError
-from forum.tasks import send_email_task
+from forum.tasks import send_bulk_email_task, send_email_task
 from forum.utils import build_email_message
 from startups.models import Startup
 from investors.models import Investor
@@ -43,20 +43,27 @@ def notify_investors_via_email(project, changes) -> None:
         investor_id__in=ProjectSubscription.objects.filter(
             project_id=project.pk
         ).values_list('investor_id', flat=True)
-    )
+    ).select_related('user')
     email_context = {
         'project_title': project.title,
         'changes': changes,
         'startup_name': Startup.objects.get(pk=project.startup.pk).name
     }
     email_body = build_email_message("email/project_update_notifications_for_investors.txt", email_context)
-    recipients = [investor.user_id.email for investor in investors]
+    recipients = {investor.user.email for investor in investors}
+    if not recipients:
+        return
 
-    send_email_task.delay(
-        subject=f"Update on Project: {project.title}",
-        body=email_body,
-        sender=EMAIL_HOST,
-        receivers=recipients,
+    send_bulk_email_task.delay(
+        messages=[
+            {
+                "subject": f"Update on Project: {project.title}",
+                "body": email_body,
+                "sender": EMAIL_HOST,
+                "receivers": [recipient],
+            }
+            for recipient in recipients
+        ]
     )
 
 def send_notification(project, action: ActionTypes) -> bool | None:
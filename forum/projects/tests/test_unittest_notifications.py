@@ -3,11 +3,12 @@ from unittest.mock import patch
 from django.core.exceptions import ValidationError
 
 from projects.utils import get_changed_fields
-from projects.notifications import send_notification
-from projects.models import Project, ProjectStatus
+from projects.notifications import notify_investors_via_email, send_notification
+from projects.models import Project, ProjectStatus, ProjectSubscription
 
 from forum.tests_setup import UserSetupMixin
 from forum.settings import EMAIL_HOST
+from investors.models import Investor
 from startups.models import Startup
 from users.models import CustomUser
 
@@ -63,6 +64,26 @@ class NotificationTests(UserSetupMixin):
             receivers=[self.startup.user.email],
         )
 
+    @patch('projects.notifications.send_bulk_email_task')
+    @patch('projects.notifications.build_email_message')
+    def test_notify_investors_via_email_in_bulk(self, mock_build_email_message, mock_send_bulk_email_task):
+        mock_build_email_message.return_value = "Email body content"
+        investor = Investor.objects.create(user=self.test_user)
+        ProjectSubscription.objects.create(project=self.project, investor=investor, part=10)
+
+        notify_investors_via_email(self.project, {"title": {"old": "old", "new": "new"}})
+
+        mock_send_bulk_email_task.delay.assert_called_once_with(
+            messages=[
+                {
+                    "subject": f"Update on Project: {self.project.title}",
+                    "body": "Email body content",
+                    "sender": EMAIL_HOST,
+                    "receivers": [self.test_user.email],
+                }
+            ]
+        )
+
 class UtilsTests(TestCase):
 
     def setUp(self):
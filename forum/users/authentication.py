@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import (
+    JWTAuthentication,
+    JWTStatelessUserAuthentication,
+)
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from forum.cache import TTLCache
+
+from .models import CustomUser
+
+# Field values are cached instead of instances, so every request gets its own
+# CustomUser and can not leak changes to others. Invalidated by users.signals.
+user_cache = TTLCache(
+    maxsize=settings.USER_CACHE_SIZE,
+    ttl=settings.USER_CACHE_TTL
+)
+
+USER_FIELDS = tuple(field.attname for field in CustomUser._meta.concrete_fields)
+
+
+def get_cached_user(user_id: int) -> CustomUser | None:
+    """
+        Return the user from the cache without touching the database.
+    """
+    values = user_cache.get(user_id)
+    if values is None:
+        return None
+
+    return CustomUser.from_db(CustomUser.objects.db, USER_FIELDS, values)
+
+
+def get_user(user_id: int) -> CustomUser | None:
+    """
+        Return the user from the cache or the database, None if the user does not exist.
+    """
+    user = get_cached_user(user_id)
+    if user is not None:
+        return user
+
+    values = CustomUser.objects.filter(user_id=user_id).values_list(*USER_FIELDS).first()
+    if values is None:
+        return None
+
+    user_cache.set(user_id, values)
+
+    return CustomUser.from_db(CustomUser.objects.db, USER_FIELDS, values)
+
+
+def invalidate_user(user_id: int) -> None:
+    user_cache.delete(user_id)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+        JWTAuthentication reading users through the short-lived user cache.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = get_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
+
+
+class ClaimsJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+        Trust signed token claims without loading the user.
+        `request.user` is a TokenUser, use it for views which need only the claims
+        (`user_id`, namespace) and tolerate a deactivated user until the token expires.
+    """
@@ -7,10 +7,24 @@ from communications.mongo_models import NamespaceEnum
 SAFE_METHODS = ['GET', 'HEAD', 'OPTIONS']
 
 
+TOKEN_PAYLOAD_CACHE_ATTR = '_token_payload_cache'
+
+
 def get_token_payload_from_cookies(request):
+    """
+        Decode and verify the access token cookie once per request.
+        The payload is memoized on the underlying HttpRequest, so views and
+        permission classes working with the DRF Request share it.
+    """
     token = request.COOKIES.get('access_token')
     if not token:
         raise PermissionDenied({"error": "Authentication credentials were not provided."})
+
+    http_request = getattr(request, '_request', request)
+    cached = getattr(http_request, TOKEN_PAYLOAD_CACHE_ATTR, None)
+    if cached and cached[0] == token:
+        return cached[1]
+
     try:
         token_obj = AccessToken(token)
         payload = token_obj.payload
@@ -18,6 +32,8 @@ def get_token_payload_from_cookies(request):
         raise PermissionDenied({"error": "Invalid or expired token."})
     if not payload:
         raise PermissionDenied({"error": "Token payload is missing."})
+
+    setattr(http_request, TOKEN_PAYLOAD_CACHE_ATTR, (token, payload))
     return payload
     
     
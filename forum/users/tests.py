@@ -14,7 +14,11 @@ from rest_framework.reverse import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken, AccessToken
+from django.test import RequestFactory
+from rest_framework.request import Request
+from users.authentication import CachedJWTAuthentication, user_cache
 from users.models import CustomUser
+from users.permissions import get_token_payload_from_cookies
 from forum.tests_setup import UserSetupMixin
 
 
@@ -866,3 +870,50 @@ class LogoutAPITestCase(APITestCase):
     def tearDown(self):
         """ Clean up any created data. """
         self.user.delete()        
+
+
+class TokenPayloadCacheTestCase(UserSetupMixin):
+    def setUp(self):
+        super().setUp()
+        self.request = RequestFactory().get('/')
+        self.request.COOKIES['access_token'] = str(AccessToken.for_user(self.test_user))
+
+    def test_token_is_decoded_once_per_request(self):
+        with patch('users.permissions.AccessToken', wraps=AccessToken) as mock_access_token:
+            payload = get_token_payload_from_cookies(Request(self.request))
+            same_payload = get_token_payload_from_cookies(Request(self.request))
+
+        mock_access_token.assert_called_once()
+        self.assertIs(payload, same_payload)
+        self.assertEqual(payload['user_id'], self.test_user.user_id)
+
+
+class CachedJWTAuthenticationTestCase(UserSetupMixin):
+    def setUp(self):
+        super().setUp()
+        user_cache.clear()
+        self.token = AccessToken.for_user(self.test_user)
+
+    def tearDown(self):
+        user_cache.clear()
+        super().tearDown()
+
+    def test_user_is_loaded_once(self):
+        authentication = CachedJWTAuthentication()
+
+        with self.assertNumQueries(1):
+            first = authentication.get_user(self.token)
+            second = authentication.get_user(self.token)
+
+        self.assertEqual(first.user_id, self.test_user.user_id)
+        self.assertEqual(second.email, self.test_user.email)
+        self.assertIsNot(first, second)
+
+    def test_cached_user_is_invalidated_on_save(self):
+        authentication = CachedJWTAuthentication()
+        authentication.get_user(self.token)
+
+        self.test_user.first_name = "changed"
+        self.test_user.save()
+
+        self.assertEqual(authentication.get_user(self.token).first_name, "changed")
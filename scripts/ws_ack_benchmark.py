@@ -0,0 +1,149 @@
+#! /bin/env python
+
+"""
+Measure notification ack throughput of the websocket server.
+
+Every socket sends `notification_ack` frames as fast as the server accepts
+them. Server does not answer acks, so the latency of the event loop is measured
+with websocket pings sent in parallel: a ping is answered by the same event loop
+which runs the consumers, any blocking call in a consumer delays pongs.
+
+Usage:
+    python ws_ack_benchmark.py --sockets 10000 --acks 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+import websockets
+from loguru import logger
+
+from websocket_client import FORUM_HOST, FORUM_PORT, get_jwt_access
+
+
+def random_notification_id() -> str:
+    return os.urandom(12).hex()
+
+
+def percentile(values: list[float], percent: float) -> float:
+    if not values:
+        return 0.0
+
+    values = sorted(values)
+    index = min(len(values) - 1, int(len(values) * percent / 100))
+    return values[index]
+
+
+class ConnectionTracker:
+    def __init__(self, expected: int) -> None:
+        self.expected = expected
+        self.connected = 0
+        self.failed = 0
+        self.all_settled = asyncio.Event()
+
+    def _settle(self) -> None:
+        if self.connected + self.failed >= self.expected:
+            self.all_settled.set()
+
+    def on_connected(self) -> None:
+        self.connected += 1
+        self._settle()
+
+    def on_failed(self) -> None:
+        self.failed += 1
+        self._settle()
+
+
+async def run_socket(
+    url: str,
+    acks: int,
+    connect_semaphore: asyncio.Semaphore,
+    tracker: ConnectionTracker,
+    start_event: asyncio.Event,
+    ping_latencies: list[float],
+) -> int:
+    async with connect_semaphore:
+        try:
+            ws_client = await websockets.connect(url, ping_interval=None, max_queue=None)
+        except Exception:
+            tracker.on_failed()
+            raise
+    tracker.on_connected()
+
+    sent = 0
+    try:
+        await start_event.wait()
+
+        for _ in range(acks):
+            await ws_client.send(
+                json.dumps(
+                    {
+                        "type": "notification_ack",
+                        "notification_id": random_notification_id()
+                    }
+                )
+            )
+            sent += 1
+
+            started_at = time.perf_counter()
+            pong_waiter = await ws_client.ping()
+            await pong_waiter
+            ping_latencies.append(time.perf_counter() - started_at)
+    finally:
+        await ws_client.close()
+
+    return sent
+
+
+async def main(sockets: int, acks: int, connect_concurrency: int) -> None:
+    access_token = get_jwt_access()
+    url = f"ws://{FORUM_HOST}:{FORUM_PORT}/ws/notifications/{access_token}"
+
+    connect_semaphore = asyncio.Semaphore(connect_concurrency)
+    tracker = ConnectionTracker(sockets)
+    start_event = asyncio.Event()
+    ping_latencies: list[float] = []
+
+    logger.info(f"Opening {sockets} sockets...")
+    tasks = [
+        asyncio.create_task(
+            run_socket(url, acks, connect_semaphore, tracker, start_event, ping_latencies)
+        )
+        for _ in range(sockets)
+    ]
+    await tracker.all_settled.wait()
+    logger.info(f"Connected: {tracker.connected}, failed to connect: {tracker.failed}")
+
+    logger.info("Sending acks...")
+    started_at = time.perf_counter()
+    start_event.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    elapsed = time.perf_counter() - started_at
+
+    errors = [result for result in results if isinstance(result, BaseException)]
+    sent = sum(result for result in results if isinstance(result, int))
+
+    logger.info(f"Acks sent: {sent} in {elapsed:.2f}s ({sent / elapsed:.0f} acks/s)")
+    if ping_latencies:
+        logger.info(
+            "Event loop latency (ping RTT): "
+            f"p50={statistics.median(ping_latencies) * 1000:.1f}ms "
+            f"p99={percentile(ping_latencies, 99) * 1000:.1f}ms "
+            f"max={max(ping_latencies) * 1000:.1f}ms"
+        )
+    for error in errors[:5]:
+        logger.error(f"Socket error: {error!r}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sockets", type=int, default=10000, help="number of concurrent sockets")
+    parser.add_argument("--acks", type=int, default=20, help="acks sent by every socket")
+    parser.add_argument("--connect-concurrency", type=int, default=200, help="sockets connecting at once")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.sockets, args.acks, args.connect_concurrency))
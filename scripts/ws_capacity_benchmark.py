@@ -0,0 +1,133 @@
+#! /bin/env python
+
+"""
+Measure websocket delivery throughput and server memory per connection.
+
+Listener sockets are opened in steps. Every listener joins the chat room
+group (`room_join`). A sender socket connected to the chat consumer then
+sends `chat_send` frames. Every message is fanned out by the channel
+layer to all listeners, and the delivered `chat_message` frames per
+second are reported for every step.
+
+The sender token must have a namespace selected and belong to a
+participant of the room. The FORUM_USER_EMAIL user, whose sockets listen,
+must be a participant of the room as well. With `--server-pid` the resident memory of a
+local server process is sampled after every step.
+
+Run the server against a local Redis (e.g. `docker run -p 6379:6379 redis`)
+or set FORUM_CHANNEL_LAYER_BACKEND=memory for a single process server.
+
+Usage:
+    python ws_capacity_benchmark.py --room <room_id> --sender-token <token> --steps 100 1000 5000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import websockets
+from loguru import logger
+
+from websocket_client import FORUM_HOST, FORUM_PORT, get_jwt_access
+
+
+def resident_memory(pid: int) -> int:
+    """
+        Return resident set size of the process in bytes (Linux only).
+    """
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+
+    return 0
+
+
+class Listener:
+    def __init__(self, ws_client) -> None:
+        self.ws_client = ws_client
+
+    async def listen(self, counter: dict) -> None:
+        async for frame in self.ws_client:
+            if json.loads(frame).get("type") == "chat_message":
+                counter["received"] += 1
+
+
+async def open_listener(url: str, room: str, semaphore: asyncio.Semaphore) -> Listener:
+    async with semaphore:
+        ws_client = await websockets.connect(url, ping_interval=None, max_queue=None)
+        await ws_client.send(json.dumps({"type": "room_join", "room": room}))
+
+    return Listener(ws_client)
+
+
+async def deliver(sender, listeners: int, messages: int, counter: dict, timeout: float) -> tuple[int, float]:
+    expected = counter["received"] + listeners * messages
+    started_at = time.perf_counter()
+
+    for number in range(messages):
+        await sender.send(json.dumps({"type": "chat_send", "content": f"benchmark {number}"}))
+
+    deadline = started_at + timeout
+    while counter["received"] < expected and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+
+    delivered = listeners * messages - (expected - counter["received"])
+    return delivered, time.perf_counter() - started_at
+
+
+async def main(args: argparse.Namespace) -> None:
+    access_token = get_jwt_access()
+    listener_url = f"ws://{FORUM_HOST}:{FORUM_PORT}/ws/notifications/{access_token}"
+    sender_url = f"ws://{FORUM_HOST}:{FORUM_PORT}/ws/chat/{args.room}/{args.sender_token}"
+
+    semaphore = asyncio.Semaphore(args.connect_concurrency)
+    counter = {"received": 0}
+    listeners: list[Listener] = []
+    tasks: list[asyncio.Task] = []
+
+    baseline_memory = resident_memory(args.server_pid) if args.server_pid else 0
+    sender = await websockets.connect(sender_url, ping_interval=None)
+    # the sender socket gets the room broadcast as well, it is drained and not counted
+    tasks.append(asyncio.create_task(Listener(sender).listen({"received": 0})))
+
+    try:
+        for step in args.steps:
+            new_listeners = await asyncio.gather(*(
+                open_listener(listener_url, args.room, semaphore)
+                for _ in range(step - len(listeners))
+            ))
+            listeners.extend(new_listeners)
+            tasks.extend(asyncio.create_task(listener.listen(counter)) for listener in new_listeners)
+            # let the server process room_join frames
+            await asyncio.sleep(1)
+
+            delivered, elapsed = await deliver(sender, len(listeners), args.messages, counter, args.timeout)
+            report = (
+                f"sockets={len(listeners)} delivered={delivered}/{len(listeners) * args.messages} "
+                f"frames/s={delivered / elapsed:.0f}"
+            )
+            if args.server_pid:
+                memory = resident_memory(args.server_pid) - baseline_memory
+                report += f" memory/socket={memory / len(listeners) / 1024:.1f}KiB"
+            logger.info(report)
+    finally:
+        await sender.close()
+        for listener in listeners:
+            await listener.ws_client.close()
+        for task in tasks:
+            task.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--room", required=True, help="id of the chat room used for the fan-out")
+    parser.add_argument("--sender-token", required=True, help="access token of a room participant with namespace")
+    parser.add_argument("--steps", type=int, nargs="+", default=[100, 1000, 5000], help="numbers of listener sockets")
+    parser.add_argument("--messages", type=int, default=20, help="messages sent at every step")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds to wait for delivery at every step")
+    parser.add_argument("--server-pid", type=int, help="pid of a local server process to sample memory")
+    parser.add_argument("--connect-concurrency", type=int, default=200, help="sockets connecting at once")
+
+    asyncio.run(main(parser.parse_args()))